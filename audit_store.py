@@ -0,0 +1,302 @@
+"""
+On-disk store for finished audits.
+
+One SQLite file holds a row per tender, a row per vendor report (the full
+VendorReport as zlib-compressed JSON plus the columns the listing filters on)
+and a row per classified document. Loading a tender returns the same list of
+VendorReports that "Run Audit" puts in st.session_state.analysis_result, so the
+comparative analytics can be rebuilt without extraction or model calls.
+
+The same file carries an FTS5 index of the extracted PDF text (tender,
+vendor, filename, body) so evaluators can search across stored tenders.
+A run indexes under a staging key; save_tender moves that text to the real
+tender ID in the same transaction, so a failed or unsaved run never touches
+the index of a stored tender.
+"""
+import json
+import os
+import sqlite3
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from report_model import VendorReport
+
+DEFAULT_DB_PATH = os.getenv("NAMA_AUDIT_DB", "audit_store.db")
+STAGING_PREFIX = "~staging-"
+# Staged text older than this belongs to a run that was interrupted before it could clean up
+STAGING_MAX_AGE = timedelta(hours=12)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tenders (
+    tender_id    TEXT PRIMARY KEY,
+    created_at   TEXT NOT NULL,
+    vendor_count INTEGER NOT NULL,
+    vendors      TEXT NOT NULL,
+    duration_s   REAL
+);
+CREATE TABLE IF NOT EXISTS vendor_reports (
+    id           INTEGER PRIMARY KEY,
+    tender_id    TEXT NOT NULL REFERENCES tenders(tender_id) ON DELETE CASCADE,
+    position     INTEGER NOT NULL,
+    company_name TEXT NOT NULL COLLATE NOCASE,
+    created_at   TEXT NOT NULL,
+    grand_total  REAL,
+    rank_label   TEXT,
+    report       BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    vendor_report_id INTEGER NOT NULL REFERENCES vendor_reports(id) ON DELETE CASCADE,
+    tender_id        TEXT NOT NULL,
+    filename         TEXT,
+    category         TEXT,
+    status           TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tenders_created ON tenders(created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_tender ON vendor_reports(tender_id, position);
+CREATE INDEX IF NOT EXISTS idx_reports_company ON vendor_reports(company_name);
+CREATE INDEX IF NOT EXISTS idx_reports_created ON vendor_reports(created_at);
+CREATE INDEX IF NOT EXISTS idx_documents_tender ON documents(tender_id);
+CREATE INDEX IF NOT EXISTS idx_documents_report ON documents(vendor_report_id);
+CREATE TABLE IF NOT EXISTS indexed_files (
+    id         INTEGER PRIMARY KEY,
+    tender_id  TEXT NOT NULL,
+    vendor     TEXT NOT NULL,
+    indexed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_indexed_files_tender ON indexed_files(tender_id, vendor);
+"""
+
+# Extracted PDF text, one row per file; its rowid is indexed_files.id so a tender or vendor
+# can be dropped without scanning the whole index. Kept outside SCHEMA because some SQLite builds lack FTS5.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS document_text USING fts5(
+    tender_id UNINDEXED,
+    vendor,
+    filename,
+    body,
+    tokenize = 'porter unicode61'
+);
+"""
+
+
+class TenderExistsError(ValueError):
+    """Raised by save_tender when the tender ID is already stored and overwrite was not requested."""
+
+
+# Wrap the matched terms in search() snippets; control characters never occur in extracted text or markdown
+HIGHLIGHT_START, HIGHLIGHT_END = "\x02", "\x03"
+
+
+def new_tender_id():
+    """Default ID for a new audit: timestamp to the second plus a short random suffix."""
+    return f"TENDER-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:4]}"
+
+def new_staging_key():
+    """Index key for the text of a run that has not been saved yet; never a valid tender ID."""
+    return f"{STAGING_PREFIX}{uuid.uuid4().hex}"
+
+def _encode_report(report):
+    return zlib.compress(json.dumps(report.to_dict()).encode("utf-8"))
+
+def _decode_report(blob):
+    # from_dict also accepts reports saved as the older plain dicts
+    return VendorReport.from_dict(json.loads(zlib.decompress(blob).decode("utf-8")))
+
+def _fts_query(text):
+    """Turns free text into an FTS5 query: every word must match, punctuation is taken literally."""
+    terms = [t.replace('"', '""') for t in text.split()]
+    return " ".join(f'"{t}"' for t in terms)
+
+
+class AuditStore:
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Stores created before indexed_files had a timestamp
+            if "indexed_at" not in {row["name"] for row in conn.execute("PRAGMA table_info(indexed_files)")}:
+                conn.execute("ALTER TABLE indexed_files ADD COLUMN indexed_at TEXT")
+            try:
+                conn.executescript(FTS_SCHEMA)
+                self.search_enabled = True
+            except sqlite3.OperationalError:
+                self.search_enabled = False
+        self.purge_staged_index()
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call: Streamlit runs every session in its own thread
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def tender_exists(self, tender_id):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM tenders WHERE tender_id = ?", (tender_id,)).fetchone() is not None
+
+    def save_tender(self, tender_id, reports, duration_s=None, overwrite=False, staged_index=None):
+        """
+        Stores every vendor report of one tender in a single transaction.
+        An existing tender is only replaced with overwrite=True, otherwise TenderExistsError is raised.
+        staged_index is the key the run's documents were indexed under; it replaces the tender's index.
+        """
+        created_at = datetime.now().isoformat(timespec="seconds")
+        vendors = ", ".join(r.company_name for r in reports)
+        with self._connect() as conn:
+            if overwrite:
+                conn.execute("DELETE FROM documents WHERE tender_id = ?", (tender_id,))
+                conn.execute("DELETE FROM tenders WHERE tender_id = ?", (tender_id,))
+            try:
+                conn.execute(
+                    "INSERT INTO tenders (tender_id, created_at, vendor_count, vendors, duration_s) VALUES (?, ?, ?, ?, ?)",
+                    (tender_id, created_at, len(reports), vendors, duration_s),
+                )
+            except sqlite3.IntegrityError:
+                # The primary key makes this check atomic even when two sessions save at once
+                raise TenderExistsError(f"Tender {tender_id} is already stored")
+            for position, report in enumerate(reports):
+                cur = conn.execute(
+                    "INSERT INTO vendor_reports (tender_id, position, company_name, created_at, grand_total, rank_label, report) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (tender_id, position, report.company_name, created_at,
+                     report.grand_total, report.rank_label, _encode_report(report)),
+                )
+                docs = report.documents
+                conn.executemany(
+                    "INSERT INTO documents (vendor_report_id, tender_id, filename, category, status) VALUES (?, ?, ?, ?, ?)",
+                    [(cur.lastrowid, tender_id, filename, category, status)
+                     for filename, category, status in zip(docs.filename, docs.category_names(), docs.status)],
+                )
+            if staged_index and self.search_enabled:
+                self._clear_index(conn, tender_id)
+                conn.execute(
+                    "UPDATE document_text SET tender_id = ? WHERE rowid IN (SELECT id FROM indexed_files WHERE tender_id = ?)",
+                    (tender_id, staged_index),
+                )
+                conn.execute("UPDATE indexed_files SET tender_id = ? WHERE tender_id = ?", (tender_id, staged_index))
+        return tender_id
+
+    def list_tenders(self, vendor=None, tender=None, since=None, until=None, limit=200):
+        """
+        Most recent tenders first.
+        vendor / tender are case-insensitive prefixes; since / until are dates or ISO strings.
+        """
+        sql = "SELECT tender_id, created_at, vendor_count, vendors, duration_s FROM tenders"
+        where, params = [], []
+        if vendor:
+            where.append("tender_id IN (SELECT tender_id FROM vendor_reports WHERE company_name LIKE ?)")
+            params.append(f"{vendor}%")
+        if tender:
+            where.append("tender_id LIKE ?")
+            params.append(f"{tender}%")
+        if since:
+            where.append("created_at >= ?")
+            params.append(str(since))
+        if until:
+            # Dates are inclusive: "2026-01-31" must still match "2026-01-31T17:00:00"
+            where.append("created_at < ?")
+            params.append(f"{until}~")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def load_tender(self, tender_id):
+        """Returns the stored reports in their original order (empty list if the tender is unknown)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT report FROM vendor_reports WHERE tender_id = ? ORDER BY position", (tender_id,)
+            ).fetchall()
+        return [_decode_report(row["report"]) for row in rows]
+
+    def delete_tender(self, tender_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM documents WHERE tender_id = ?", (tender_id,))
+            conn.execute("DELETE FROM tenders WHERE tender_id = ?", (tender_id,))
+        self.clear_index(tender_id)
+
+    # --- Full-text search over extracted documents ---
+    @staticmethod
+    def _clear_index(conn, tender_id):
+        conn.execute(
+            "DELETE FROM document_text WHERE rowid IN (SELECT id FROM indexed_files WHERE tender_id = ?)", (tender_id,)
+        )
+        conn.execute("DELETE FROM indexed_files WHERE tender_id = ?", (tender_id,))
+
+    def clear_index(self, tender_id):
+        if not self.search_enabled:
+            return
+        with self._connect() as conn:
+            self._clear_index(conn, tender_id)
+
+    def purge_staged_index(self, max_age=STAGING_MAX_AGE):
+        """Drops staged text left behind by runs that never reached their cleanup (crash, killed server)."""
+        if not self.search_enabled:
+            return
+        cutoff = (datetime.now() - max_age).isoformat(timespec="seconds")
+        with self._connect() as conn:
+            stale = (
+                "SELECT id FROM indexed_files WHERE tender_id LIKE ? AND (indexed_at IS NULL OR indexed_at < ?) "
+                "AND tender_id NOT IN (SELECT tender_id FROM tenders)"
+            )
+            params = (f"{STAGING_PREFIX}%", cutoff)
+            conn.execute(f"DELETE FROM document_text WHERE rowid IN ({stale})", params)
+            conn.execute(f"DELETE FROM indexed_files WHERE id IN ({stale})", params)
+
+    def index_documents(self, tender_id, vendor, docs):
+        """
+        Replaces the indexed text of one vendor under tender_id (a staging key while the audit runs).
+        docs is a list of (filename, text); called once per vendor as soon as its extraction finishes.
+        """
+        if not self.search_enabled:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM document_text WHERE rowid IN "
+                "(SELECT id FROM indexed_files WHERE tender_id = ? AND vendor = ?)", (tender_id, vendor)
+            )
+            conn.execute("DELETE FROM indexed_files WHERE tender_id = ? AND vendor = ?", (tender_id, vendor))
+            indexed_at = datetime.now().isoformat(timespec="seconds")
+            for filename, text in docs:
+                cur = conn.execute(
+                    "INSERT INTO indexed_files (tender_id, vendor, indexed_at) VALUES (?, ?, ?)", (tender_id, vendor, indexed_at)
+                )
+                conn.execute(
+                    "INSERT INTO document_text (rowid, tender_id, vendor, filename, body) VALUES (?, ?, ?, ?, ?)",
+                    (cur.lastrowid, tender_id, vendor, filename, text),
+                )
+
+    def search(self, text, tender_id=None, limit=25):
+        """
+        Best matches first (bm25, vendor and filename hits weigh more than body hits).
+        Matched terms in the snippet are wrapped in HIGHLIGHT_START / HIGHLIGHT_END.
+        Only saved tenders are searched; staged text of a running or abandoned audit is skipped.
+        """
+        query = _fts_query(text)
+        if not self.search_enabled or not query:
+            return []
+        sql = (
+            "SELECT t.tender_id, d.vendor, d.filename, "
+            "snippet(document_text, 3, ?, ?, ' … ', 16) AS snippet, "
+            "bm25(document_text, 0.0, 4.0, 2.0, 1.0) AS score "
+            "FROM document_text d JOIN tenders t ON t.tender_id = d.tender_id "
+            "WHERE document_text MATCH ?"
+        )
+        params = [HIGHLIGHT_START, HIGHLIGHT_END, query]
+        if tender_id:
+            sql += " AND t.tender_id = ?"
+            params.append(tender_id)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
@@ -0,0 +1,346 @@
+"""
+Offline audit benchmark.
+
+Generates synthetic vendor ZIPs and runs them through the same
+read_vendor_zip -> process_company_documents path as "Run Audit", with
+Gemini replaced by a local fake model. Prints one JSON document so runs can
+be diffed across commits:
+
+    python benchmark.py --vendors 5 --files-per-vendor 20 --latency 0.5 > bench_output.txt
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import zipfile
+import zlib
+
+import streamlit.config
+import streamlit.logger
+
+# bid_app runs its Streamlit layout on import (logo paths are relative to the repo root)
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+# Never write benchmark runs into the real audit store
+os.environ["NAMA_AUDIT_DB"] = os.path.join(tempfile.mkdtemp(prefix="nama-bench-"), "audit_store.db")
+# Keep bare-mode warnings ("missing ScriptRunContext") off stderr. Parsing the config first matters:
+# it resets every Streamlit logger to logger.level ("info") the first time an st.* call needs it.
+streamlit.config.get_config_options()
+streamlit.logger.set_log_level("error")
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import bid_app  # noqa: E402
+
+
+# --- 1. SYNTHETIC PDF CORPUS ---
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def build_pdf(pages):
+    """
+    Writes a minimal PDF by hand.
+    Each page is ("text", [lines]) for a text layer or ("image", width, height, seed)
+    for a scanned-like page with only a grayscale image and no extractable text.
+    """
+    objects = [None, None]  # 1 = catalog, 2 = page tree
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")  # 3
+    page_ids = []
+
+    for page in pages:
+        if page[0] == "text":
+            ops = ["BT /F1 10 Tf 50 800 Td 12 TL"]
+            ops += [f"({_pdf_escape(line)}) '" for line in page[1]]
+            ops.append("ET")
+            stream = "\n".join(ops).encode("latin-1", "replace")
+            resources = b"<< /Font << /F1 3 0 R >> >>"
+        else:
+            _, width, height, seed = page
+            noise = random.Random(seed).randbytes(width * height)
+            image = zlib.compress(noise)
+            objects.append(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n" % (width, height, len(image))
+                + image + b"\nendstream"
+            )
+            image_id = len(objects)
+            stream = b"q 595 0 0 842 0 0 cm /Im1 Do Q"
+            resources = b"<< /XObject << /Im1 %d 0 R >> >>" % image_id
+
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources %s /Contents %d 0 R >>"
+            % (resources, content_id)
+        )
+        page_ids.append(len(objects))
+
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+def _text_pages(rng, title, n_pages, lines_per_page=40):
+    words = ["supply", "ductile", "iron", "valve", "pipe", "WRAS", "ISO", "compliance", "Muscat",
+             "Sohar", "Salalah", "project", "certificate", "warranty", "delivery", "OMR", "factory"]
+    pages = []
+    for p in range(n_pages):
+        lines = [f"{title} - page {p + 1}"]
+        lines += [" ".join(rng.choice(words) for _ in range(12)) for _ in range(lines_per_page)]
+        pages.append(("text", lines))
+    return pages
+
+def make_vendor_zip(vendor_idx, args):
+    """One vendor submission: a file per REQUIRED_DOCS category plus proposal, scans and duplicates."""
+    rng = random.Random(args.seed * 1000 + vendor_idx)
+    vendor = f"Synthetic Vendor {vendor_idx + 1:03d}"
+    files = {}
+
+    for n in range(args.files_per_vendor):
+        code = n % len(bid_app.REQUIRED_DOCS) + 1
+        name = f"{code:02d}_document_{n + 1:03d}.pdf"
+        if rng.random() < args.scanned_ratio:
+            pages = [("image", args.scan_px, args.scan_px, rng.random()) for _ in range(rng.randint(1, 3))]
+        else:
+            pages = _text_pages(rng, f"{vendor} {bid_app.REQUIRED_DOCS[code - 1][:60]}", rng.randint(1, 4))
+        files[name] = build_pdf(pages)
+
+    proposal = _text_pages(rng, f"{vendor} Financial Proposal", args.proposal_pages, lines_per_page=55)
+    proposal[0][1].insert(1, f"Grand Total: {rng.uniform(50_000, 900_000):.2f} OMR")
+    files["financial_proposal.pdf"] = build_pdf(proposal)
+
+    iso = build_pdf(_text_pages(rng, f"{vendor} ISO 9001 certificate valid until 2027-12-31", 1))
+    for d in range(args.duplicates):
+        files[f"05_iso_certificate_copy_{d + 1}.pdf"] = iso
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in files.items():
+            z.writestr(name, data)
+        z.writestr("__MACOSX/._financial_proposal.pdf", b"")
+    buf.seek(0)
+    buf.name = f"{vendor}.zip"
+    return buf
+
+
+# --- 2. FAKE GEMINI ---
+class FakeModelStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+class FakeGenerativeModel:
+    """
+    Stand-in for genai.GenerativeModel.
+    Sleeps for the configured latency, fails at the configured rate, classifies
+    documents from their filename prefix and reports ~4 chars/token usage.
+    """
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    rng = random.Random(0)
+    stats = FakeModelStats()
+
+    def __init__(self, model_name=None, generation_config=None):
+        self.model_name = model_name
+
+    @classmethod
+    def configure(cls, latency, jitter, error_rate, seed):
+        cls.latency, cls.jitter, cls.error_rate = latency, jitter, error_rate
+        cls.rng = random.Random(seed)
+        cls.stats = FakeModelStats()
+
+    def generate_content(self, contents, generation_config=None):
+        cls = type(self)
+        with cls.stats.lock:
+            delay = max(0.0, cls.latency + cls.rng.uniform(-cls.jitter, cls.jitter))
+            fail = cls.rng.random() < cls.error_rate
+        time.sleep(delay)
+
+        prompt_text = "".join(str(c) for c in contents)
+        input_tokens = len(prompt_text) // 4
+        if fail:
+            with cls.stats.lock:
+                cls.stats.calls += 1
+                cls.stats.errors += 1
+                cls.stats.input_tokens += input_tokens
+            raise RuntimeError("fake 503: model overloaded")
+
+        filenames = [m.strip() for m in re.findall(r"FILE_NAME: (.+)", contents[-1])]
+        found, refs, quotation = [], [], None
+        for fn in filenames:
+            if fn.startswith("financial_proposal"):
+                quotation = fn
+                continue
+            code = int(fn[:2]) if fn[:2].isdigit() else 0
+            if 1 <= code <= len(bid_app.REQUIRED_DOCS):
+                category = bid_app.REQUIRED_DOCS[code - 1]
+                found.append({"filename": fn, "Category": category, "Status": "Valid"})
+                if code == 14:
+                    refs.append({"filename": fn, "Category": category, "Status": "Valid", "project_count": 3})
+
+        grand_total = 0.0
+        total = re.search(r"Grand Total: ([\d.]+)", contents[-1])
+        if total:
+            grand_total = float(total.group(1))
+
+        payload = json.dumps({
+            "iso_analysis": [{"standard": "ISO 9001", "expiry_date": "2027-12-31", "days_remaining": 400, "compliance_status": "Pass"}],
+            "found_documents": found,
+            "wras_analysis": {"found": False, "wras_id": ""},
+            "reference_list": refs,
+            "extracted_data": {
+                "company_name": "",
+                "icv_score": "12%",
+                "payment_terms": "10% Advance",
+                "advance_payment_percentage": 10,
+                "grand_total": grand_total,
+                "project_history": str(3 * len(refs)),
+                "technical_compliance_score": "",
+                "quotation_file": quotation,
+            },
+        })
+        output_tokens = len(payload) // 4
+        with cls.stats.lock:
+            cls.stats.calls += 1
+            cls.stats.input_tokens += input_tokens
+            cls.stats.output_tokens += output_tokens
+        return types.SimpleNamespace(
+            text=payload,
+            usage_metadata=types.SimpleNamespace(prompt_token_count=input_tokens, candidates_token_count=output_tokens),
+        )
+
+
+# --- 3. RUNNER ---
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_benchmark(args):
+    FakeGenerativeModel.configure(args.latency, args.jitter, args.error_rate, args.seed)
+    bid_app.genai.GenerativeModel = FakeGenerativeModel
+
+    gen_start = time.perf_counter()
+    zips = [make_vendor_zip(i, args) for i in range(args.vendors)]
+    corpus_bytes = sum(len(z.getvalue()) for z in zips)
+    gen_s = time.perf_counter() - gen_start
+
+    metrics = bid_app.AuditMetrics(audit_id=f"bench-{args.seed}")
+    vendor_latencies = []
+    total_files = 0
+
+    run_start = time.perf_counter()
+    for _ in range(args.repeat):
+        for zip_file in zips:
+            zip_file.seek(0)
+            vendor = zip_file.name.replace(".zip", "")
+            t0 = time.perf_counter()
+            with metrics.span("zip_read", vendor=vendor):
+                pdfs = bid_app.read_vendor_zip(zip_file)
+            if args.mode == "analyze":
+                texts = [f"FILE_NAME: {p.name}\n(Extracted via Text Layer)\n" for p in pdfs]
+                bid_app.analyze_documents(texts, metrics=metrics, vendor=vendor)
+            else:
+                bid_app.process_company_documents(pdfs, metrics=metrics, vendor=vendor)
+            vendor_latencies.append(time.perf_counter() - t0)
+            total_files += len(pdfs)
+    wall_s = time.perf_counter() - run_start
+
+    stages = {}
+    for row in metrics.summary().groupby("stage")[["calls", "total_s"]].sum().reset_index().itertuples():
+        stages[row.stage] = {"calls": int(row.calls), "total_s": round(float(row.total_s), 4)}
+
+    stats = FakeGenerativeModel.stats
+    return {
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "corpus": {"vendors": len(zips), "zip_bytes": corpus_bytes, "generate_s": round(gen_s, 3)},
+        "wall_s": round(wall_s, 4),
+        "throughput": {
+            "vendors_per_s": round(len(vendor_latencies) / wall_s, 3) if wall_s else None,
+            "files_per_s": round(total_files / wall_s, 3) if wall_s else None,
+        },
+        "vendor_latency_s": {
+            "p50": round(percentile(vendor_latencies, 50), 4),
+            "p95": round(percentile(vendor_latencies, 95), 4),
+            "max": round(max(vendor_latencies), 4) if vendor_latencies else 0.0,
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "model": {
+            "calls": stats.calls,
+            "errors": stats.errors,
+            "input_tokens": stats.input_tokens,
+            "output_tokens": stats.output_tokens,
+        },
+        "stages": stages,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for the NAMA audit pipeline.")
+    parser.add_argument("--vendors", type=int, default=5)
+    parser.add_argument("--files-per-vendor", type=int, default=14)
+    parser.add_argument("--scanned-ratio", type=float, default=0.3, help="share of image-only (scanned-like) PDFs")
+    parser.add_argument("--scan-px", type=int, default=400, help="side length of scanned page images")
+    parser.add_argument("--proposal-pages", type=int, default=30, help="pages in each financial proposal")
+    parser.add_argument("--duplicates", type=int, default=2, help="duplicate ISO certificates per vendor")
+    parser.add_argument("--mode", choices=["full", "analyze"], default="full",
+                        help="full = process_company_documents, analyze = analyze_documents on stub texts")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmark(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
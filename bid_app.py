@@ -1,9 +1,14 @@
 import streamlit as st
 import google.generativeai as genai 
-import re 
+import math
 import os 
 import pandas as pd
 import json
+import re
+import time
+import threading
+from contextlib import contextmanager
+from functools import partial
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date
 from dotenv import load_dotenv
@@ -11,6 +16,8 @@ import pypdf
 import io
 import zipfile 
 import altair as alt 
+from audit_store import HIGHLIGHT_END, HIGHLIGHT_START, AuditStore, TenderExistsError, new_staging_key, new_tender_id
+from report_model import REQUIRED_DOCS, VendorReport
 
 
 class VirtualFile:
@@ -21,6 +28,92 @@ class VirtualFile:
     def getvalue(self):
         return self.bytes
 
+
+class AuditMetrics:
+    """
+    Collects timed spans for one audit run.
+    Each span is a flat dict (stage, vendor, duration + stage specific fields)
+    so it can be shown as a table or exported as JSONL / Prometheus text.
+    """
+    def __init__(self, audit_id=None):
+        self.audit_id = audit_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, vendor=None, **fields):
+        record = {"audit_id": self.audit_id, "stage": stage, "vendor": vendor, **fields}
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = str(e)
+            raise
+        finally:
+            record["duration_s"] = round(time.perf_counter() - start, 4)
+            with self._lock:
+                self.spans.append(record)
+
+    def summary(self):
+        """Totals per vendor and stage, slowest first."""
+        if not self.spans:
+            return pd.DataFrame(columns=["vendor", "stage", "calls", "total_s", "max_s"])
+        df = pd.DataFrame(self.spans)
+        df["vendor"] = df["vendor"].fillna("(audit)")
+        summary = df.groupby(["vendor", "stage"]).agg(
+            calls=("duration_s", "size"),
+            total_s=("duration_s", "sum"),
+            max_s=("duration_s", "max"),
+        ).reset_index()
+        for col in ["pages", "chars", "input_tokens", "output_tokens"]:
+            if col in df.columns:
+                summary = summary.merge(
+                    df.groupby(["vendor", "stage"])[col].sum(min_count=1).reset_index(),
+                    on=["vendor", "stage"], how="left"
+                )
+        return summary.sort_values("total_s", ascending=False).reset_index(drop=True)
+
+    def to_jsonl(self):
+        return "\n".join(json.dumps(s, default=str) for s in self.spans) + "\n"
+
+    def to_prometheus(self):
+        def esc(v):
+            return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        counters = {
+            "nama_stage_duration_seconds_total": ("Wall time spent per audit stage.", "duration_s"),
+            "nama_stage_calls_total": ("Number of spans recorded per audit stage.", None),
+            "nama_extracted_pages_total": ("PDF pages read during text extraction.", "pages"),
+            "nama_extracted_chars_total": ("Characters returned by text extraction.", "chars"),
+            "nama_model_input_tokens_total": ("Prompt tokens sent to Gemini.", "input_tokens"),
+            "nama_model_output_tokens_total": ("Response tokens returned by Gemini.", "output_tokens"),
+            "nama_stage_errors_total": ("Spans that ended with an error.", "error"),
+        }
+        totals = {name: {} for name in counters}
+        for s in self.spans:
+            key = (s["audit_id"], s.get("vendor") or "", s["stage"])
+            for name, (_, field) in counters.items():
+                if field is None:
+                    value = 1
+                elif field == "error":
+                    value = 1 if s.get("error") else 0
+                elif field not in s:
+                    continue
+                else:
+                    value = s.get(field) or 0
+                totals[name][key] = totals[name].get(key, 0) + value
+
+        lines = []
+        for name, (help_text, _) in counters.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (audit_id, vendor, stage), value in totals[name].items():
+                labels = f'audit_id="{esc(audit_id)}",vendor="{esc(vendor)}",stage="{esc(stage)}"'
+                # Sums of float durations pick up artifacts (0.22309999999999997); integer counters stay exact
+                value = value if isinstance(value, int) else round(value, 6)
+                lines.append(f"{name}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
 # --- 1. CONFIGURATION & SETUP ---
 load_dotenv()
 st.set_page_config(page_title="NAMA Compliance Agent", layout="wide")
@@ -31,23 +124,6 @@ try:
 except Exception as e:
     st.error(f"Configuration Error: {e}")
 
-REQUIRED_DOCS = [
-    "1- Fees application receipt copy.",
-    "2- Nama water services vendor registeration certificates & Product Agency certificates or authorization letter from Factory for local distributor ratified from Oman embassy.",
-    "3- Certificate of incorporation of the firm (Factory & Foundry).",
-    "4- Manufacturing Process flow chart of product and list of out sourced process / operation if applicable including Outsourcing name & address.",
-    "5- Valid copies certificates of (ISO 9001, ISO 45001 & ISO 14001).",
-    "6- Factory Layout chart.",
-    "7- Factory Organizational structure, Hierarchy levels, Ownership details.",
-    "8- Product Compliance Statement with reference to Nama water services specifications (with supports documents accordingly).",
-    "9- Product Technical datasheets.",
-    "10- Omanisation details from Ministry of Labour.",
-    "11- Product Independent Test certificates.",
-    "12- Attestation of Sanitary Conformity (hygiene test including mechanical assessment for a full product certificate at 50 degrees Celsiusfull to used in drinking water)",
-    "13- Provide products Chemicals Composition of materials.",
-    "14- Reference list of products used in Oman or any GCC projects with contact no. or emails of end user or clients."
-]
-
 COMPLIANCE_DATA = [
     [1, "Bidder’s Information Sheet", "Yes"],
     [2, "Company Registrations", "Yes"],
@@ -109,44 +185,67 @@ COMPLIANCE_DATA = [
 
 
 # --- 2. INTELLIGENT EXTRACTION (Hybrid: Text First -> OCR Fallback) ---
-def extract_text_smart(uploaded_file):
+def extract_text_smart(uploaded_file, metrics=None, vendor=None):
     """
     Attempts to read text directly. 
     If text < 50 chars (likely scanned), falls back to OCR.
     """
+    metrics = metrics or AuditMetrics()
     text = ""
     file_bytes = uploaded_file.getvalue()
     
-    try:
-        # METHOD 1: Direct Text Extraction (Super Fast)
-        pdf_reader = pypdf.PdfReader(io.BytesIO(file_bytes))
-        # Limit to first 3 pages
-        num_pages = len(pdf_reader.pages)
-        limit = min(3, num_pages)
-        
-        for i in range(limit):
-            page_text = pdf_reader.pages[i].extract_text()
-            if page_text:
-                text += page_text
+    with metrics.span("extract", vendor=vendor, filename=uploaded_file.name, backend="text_layer") as span:
+        try:
+            # METHOD 1: Direct Text Extraction (Super Fast)
+            pdf_reader = pypdf.PdfReader(io.BytesIO(file_bytes))
+            # Limit to first 3 pages
+            num_pages = len(pdf_reader.pages)
+            limit = min(3, num_pages)
+            span["pages"] = limit
+            
+            for i in range(limit):
+                page_text = pdf_reader.pages[i].extract_text()
+                if page_text:
+                    text += page_text
 
-        # If we found substantial text, return it immediately
-        if len(text.strip()) > 100: 
-            return f"FILE_NAME: {uploaded_file.name}\n(Extracted via Text Layer)\n{text[:15000]}"
+            span["chars"] = len(text)
+            # If we found substantial text, return it immediately
+            if len(text.strip()) > 100: 
+                return f"FILE_NAME: {uploaded_file.name}\n(Extracted via Text Layer)\n{text[:15000]}"
 
-    except Exception as e:
-        print(f"Direct extract failed for {uploaded_file.name}: {e}")
+        except Exception as e:
+            print(f"Direct extract failed for {uploaded_file.name}: {e}")
+            span["error"] = str(e)
 
+        span["backend"] = "failed"
     return f"FILE_NAME: {uploaded_file.name}\n(Extraction Failed: Could not extract text)"
 
-def batch_extract_all(files):
+def extracted_body(extracted):
+    """The PDF text inside an extract_text_smart result, without its FILE_NAME header ("" if extraction failed)."""
+    header, _, body = extracted.partition("\n(Extracted via Text Layer)\n")
+    return body if header.startswith("FILE_NAME: ") else ""
+
+def read_vendor_zip(zip_file):
+    """Returns the PDFs inside one vendor ZIP as VirtualFiles (skips macOS/hidden entries)."""
+    company_pdfs = []
+    with zipfile.ZipFile(zip_file) as z:
+        for filename in z.namelist():
+            if filename.lower().endswith(".pdf") and not filename.startswith("__MACOSX") and not filename.startswith("."):
+                with z.open(filename) as f:
+                    content = f.read()
+                    company_pdfs.append(VirtualFile(filename, content))
+    return company_pdfs
+
+def batch_extract_all(files, metrics=None, vendor=None):
     """Uses ThreadPoolExecutor to process files simultaneously."""
     # Increased workers since direct extraction is not CPU bound
     with ThreadPoolExecutor(max_workers=10) as executor:
-        results = list(executor.map(extract_text_smart, files))
+        results = list(executor.map(partial(extract_text_smart, metrics=metrics, vendor=vendor), files))
     return results
 
 # --- 3. BATCHED AI ANALYSIS ---
-def analyze_batch(batch_text_list):
+def analyze_batch(batch_text_list, metrics=None, vendor=None):
+    metrics = metrics or AuditMetrics()
     model = genai.GenerativeModel('gemini-2.5-pro',generation_config={"temperature": 0.0})
     today_str = date.today().strftime("%Y-%m-%d")
 
@@ -186,7 +285,6 @@ def analyze_batch(batch_text_list):
              "commercial_info": "Commercial comparison details",
              "grand_total": 0.0,
              "project_history": "Total count of previous projects found as a number (e.g. '5')",
-             "project_history": "Total count of previous projects found as a number (e.g. '5')",
              "technical_compliance_score": "Technical compliance score or percentage if explicitly mentioned (e.g. '98%')",
              "quotation_file": "filename.pdf"
         }}
@@ -200,16 +298,21 @@ def analyze_batch(batch_text_list):
     
     combined_content = "\n\n=== NEXT DOCUMENT ===\n".join(batch_text_list)
     
-    try:
-        response = model.generate_content(
-            contents=[prompt, combined_content],
-            generation_config={"response_mime_type": "application/json"}
-        )
-        data = json.loads(response.text)
-        if isinstance(data, list): return data[0]
-        return data
-    except Exception:
-        return {}
+    with metrics.span("model_call", vendor=vendor, documents=len(batch_text_list)) as span:
+        try:
+            response = model.generate_content(
+                contents=[prompt, combined_content],
+                generation_config={"response_mime_type": "application/json"}
+            )
+            usage = getattr(response, "usage_metadata", None)
+            span["input_tokens"] = getattr(usage, "prompt_token_count", None)
+            span["output_tokens"] = getattr(usage, "candidates_token_count", None)
+            data = json.loads(response.text)
+            if isinstance(data, list): return data[0]
+            return data
+        except Exception as e:
+            span["error"] = str(e)
+            return {}
 
 #
 
@@ -218,34 +321,72 @@ def clear_submit():
     st.session_state.uploader_id += 1
     if "analysis_result" in st.session_state:
         del st.session_state["analysis_result"]
-
-def process_company_documents(files, status_container=None):
+    if "audit_metrics" in st.session_state:
+        del st.session_state["audit_metrics"]
+    if "loaded_tender_id" in st.session_state:
+        del st.session_state["loaded_tender_id"]
+    if "default_tender_id" in st.session_state:
+        del st.session_state["default_tender_id"]
+
+@st.cache_resource
+def get_audit_store():
+    return AuditStore()
+
+def escape_markdown(text):
+    """Backslash-escapes characters st.markdown would read as formatting, math or HTML."""
+    return re.sub(r"([\\`*_{}\[\]()#+\-.!|$<>~])", r"\\\1", " ".join(str(text).split()))
+
+def snippet_markdown(snippet):
+    """Search snippet as markdown: document text escaped, matched terms in bold."""
+    text = escape_markdown(snippet)
+    return text.replace(HIGHLIGHT_START, "**").replace(HIGHLIGHT_END, "**")
+
+def load_stored_tender(tender_id):
+    reports = get_audit_store().load_tender(tender_id)
+    for r in reports:
+        # Indexes point into the upload list of the original run, not the current one
+        r.source_zip_index = None
+    st.session_state.analysis_result = reports
+    st.session_state.loaded_tender_id = tender_id
+    if "audit_metrics" in st.session_state:
+        del st.session_state["audit_metrics"]
+
+def process_company_documents(files, status_container=None, metrics=None, vendor=None, index=None):
     """
     Orchestrates the extraction and analysis for a list of file-like objects.
+    index(vendor, [(filename, text)]) is called as soon as extraction finishes, before the AI step.
     """
+    metrics = metrics or AuditMetrics()
     if status_container:
          status_container.write(f"Extracting text from {len(files)} files...")
     
     # 1. Text Extraction
-    all_texts = batch_extract_all(files)
+    with metrics.span("extract_all", vendor=vendor, files=len(files)):
+        all_texts = batch_extract_all(files, metrics=metrics, vendor=vendor)
+
+    if index:
+        with metrics.span("index", vendor=vendor):
+            try:
+                index(vendor, [(f.name, extracted_body(t)) for f, t in zip(files, all_texts)])
+            except Exception as e:
+                print(f"Search indexing failed for {vendor}: {e}")
     
     if status_container:
          status_container.write("Analyzing content with AI...")
 
     # 2. Analysis
-    final_report = analyze_documents(all_texts)
+    final_report = analyze_documents(all_texts, metrics=metrics, vendor=vendor)
     
     return final_report
 
-def analyze_documents(all_texts):
+def analyze_documents(all_texts, metrics=None, vendor=None):
+    metrics = metrics or AuditMetrics()
      # 2. Parallel AI Analysis Logic (Refactored from previous main block)
     final_report = {
         "iso_analysis": [],
         "wras_analysis": {"found": False, "wras_id": []},
         "found_documents": [],
         "reference_list": [],
-        "missing_documents": set(REQUIRED_DOCS),
-        "wras_online_check": {"status": "N/A", "url": "#"},
         "company_name": "Unknown Company",
         "icv_score": "N/A",
         "payment_terms": "N/A",
@@ -253,17 +394,18 @@ def analyze_documents(all_texts):
         "grand_total": 0.0,
         "project_history": "N/A",
         "technical_compliance_score": "N/A",
-        "technical_compliance_score": "N/A",
         "advance_payment_percentage": 0,
         "quotation_file": None
     }
 
     # Create batches
-    batch_size = 8
-    batches = [all_texts[i:i + batch_size] for i in range(0, len(all_texts), batch_size)]
+    with metrics.span("batch_build", vendor=vendor) as span:
+        batch_size = 8
+        batches = [all_texts[i:i + batch_size] for i in range(0, len(all_texts), batch_size)]
+        span["batches"] = len(batches)
     
     with ThreadPoolExecutor(max_workers=4) as executor:
-        future_to_batch = {executor.submit(analyze_batch, batch): batch for batch in batches}
+        future_to_batch = {executor.submit(analyze_batch, batch, metrics, vendor): batch for batch in batches}
         
         for future in as_completed(future_to_batch):
             batch_res = future.result()
@@ -308,15 +450,11 @@ def analyze_documents(all_texts):
                 if isinstance(wras, dict) and wras.get("found"):
                     final_report["wras_analysis"] = wras
 
-    # Post-Processing
-    for doc in final_report["found_documents"]:
-        doc_type = doc.get("Category")
-        if doc_type in final_report["missing_documents"]:
-            final_report["missing_documents"].remove(doc_type)
+    # Post-Processing: parse numbers and encode documents once (missing docs are derived from the category codes)
+    with metrics.span("aggregate", vendor=vendor):
+        report = VendorReport.from_legacy(final_report)
 
-
-        
-    return final_report
+    return report
 
 # --- 5. UI & EXECUTION LOGIC ---
 # 1. Page Configuration
@@ -356,439 +494,462 @@ st.title("🎯 AI Tender Analytical Engine")
 if "uploader_id" not in st.session_state:
     st.session_state.uploader_id = 0
 
+# --- STORED TENDERS (Sidebar) ---
+with st.sidebar:
+    st.header("📂 Stored Tenders")
+    f_vendor = st.text_input("Vendor name starts with")
+    f_tender = st.text_input("Tender ID starts with")
+    f_dates = st.date_input("Audit date range", value=(), format="YYYY-MM-DD")
+    f_since = f_dates[0] if len(f_dates) > 0 else None
+    f_until = f_dates[1] if len(f_dates) > 1 else f_since
+    try:
+        stored = get_audit_store().list_tenders(vendor=f_vendor, tender=f_tender, since=f_since, until=f_until)
+    except Exception as e:
+        stored = []
+        st.error(f"Audit store unavailable: {e}")
+
+    if stored:
+        labels = {t["tender_id"]: f"{t['tender_id']} · {t['created_at'][:10]} · {t['vendor_count']} vendors" for t in stored}
+        selected_tender = st.selectbox("Tender", list(labels), format_func=labels.get)
+        st.caption(next(t["vendors"] for t in stored if t["tender_id"] == selected_tender))
+        st.button("Load Tender", on_click=load_stored_tender, args=(selected_tender,))
+    else:
+        st.caption("No stored audits match these filters.")
+
+# --- DOCUMENT SEARCH ---
+with st.expander("🔎 Search Tender Documents", expanded=False):
+    search_text = st.text_input("Search extracted text", placeholder="e.g. WRAS approval, Sohar")
+    current_tender = st.session_state.get("loaded_tender_id")
+    only_current = st.checkbox(f"Only tender {current_tender}", value=False, disabled=not current_tender)
+    if search_text:
+        search_start = time.perf_counter()
+        hits = get_audit_store().search(search_text, tender_id=current_tender if only_current else None)
+        st.caption(f"{len(hits)} matches in {(time.perf_counter() - search_start) * 1000:.0f} ms")
+        for hit in hits:
+            st.markdown(
+                f"**{escape_markdown(hit['vendor'])}** · {escape_markdown(hit['filename'])} · {escape_markdown(hit['tender_id'])}  \n"
+                f"{snippet_markdown(hit['snippet'])}"
+            )
+
 uploaded_files = st.file_uploader("Upload Vendor ZIP Files (One ZIP per Vendor)", type=["zip"], accept_multiple_files=True, key=f"file_uploader_{st.session_state.uploader_id}")
 if uploaded_files:
     st.success(f"Loaded {len(uploaded_files)} ZIP files.")
     st.button("Clear", on_click=clear_submit)
+    if "default_tender_id" not in st.session_state:
+        st.session_state.default_tender_id = new_tender_id()
+    # Keyed by the default so the box is reset whenever a save hands out a new one (like uploader_id)
+    tender_id = st.text_input("Tender ID", value=st.session_state.default_tender_id, key=f"tender_id_{st.session_state.default_tender_id}")
+    store = get_audit_store()
+    overwrite = False
+    if store.tender_exists(tender_id):
+        st.warning(f"Tender **{tender_id}** is already in the audit store. Running the audit again replaces it.")
+        overwrite = st.checkbox("Overwrite the stored tender", key=f"overwrite_{st.session_state.default_tender_id}")
     
     if st.button("Run Audit", type="primary"):
-        if uploaded_files:
+        if store.tender_exists(tender_id) and not overwrite:
+            st.error("Confirm the overwrite above or enter a different Tender ID before running the audit.")
+        elif uploaded_files:
             start_time = datetime.now()
             all_reports = []
+            metrics = AuditMetrics()
+            # Text is indexed under a staging key and only replaces the tender's index when the audit is saved
+            index_key = new_staging_key()
 
-            # Progress Bar for ZIPs
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+            try:
+                # Progress Bar for ZIPs
+                progress_bar = st.progress(0)
+                status_text = st.empty()
 
-            for idx, zip_file in enumerate(uploaded_files):
-                status_text.write(f"Processing {zip_file.name}...")
+                for idx, zip_file in enumerate(uploaded_files):
+                    status_text.write(f"Processing {zip_file.name}...")
+                    vendor = zip_file.name.replace(".zip", "")
                 
-                # valid_pdf_files for this company
-                company_pdfs = []
-                
-                try:
-                    with zipfile.ZipFile(zip_file) as z:
-                        for filename in z.namelist():
-                            if filename.lower().endswith(".pdf") and not filename.startswith("__MACOSX") and not filename.startswith("."):
-                                with z.open(filename) as f:
-                                    content = f.read()
-                                    company_pdfs.append(VirtualFile(filename, content))
-                except Exception as e:
-                    st.error(f"Error reading zip {zip_file.name}: {e}")
-                    continue
-
-                if not company_pdfs:
-                    st.warning(f"No PDFs found in {zip_file.name}")
-                    continue
-
-                # Process this company's files
-                with st.status(f"Analyzing {zip_file.name}...", expanded=False) as status:
-                    report = process_company_documents(company_pdfs, status_container=status)
-                    # If company name wasn't found in text, use zip filename
-                    if report["company_name"] == "Unknown Company":
-                         report["company_name"] = zip_file.name.replace(".zip", "")
+                    # valid_pdf_files for this company
+                    try:
+                        with metrics.span("zip_read", vendor=vendor) as span:
+                            company_pdfs = read_vendor_zip(zip_file)
+                            span["files"] = len(company_pdfs)
+                            span["bytes"] = sum(len(p.bytes) for p in company_pdfs)
+                    except Exception as e:
+                        st.error(f"Error reading zip {zip_file.name}: {e}")
+                        continue
+
+                    if not company_pdfs:
+                        st.warning(f"No PDFs found in {zip_file.name}")
+                        continue
+
+                    # Process this company's files
+                    with st.status(f"Analyzing {zip_file.name}...", expanded=False) as status:
+                        report = process_company_documents(company_pdfs, status_container=status, metrics=metrics, vendor=vendor,
+                                                           index=partial(store.index_documents, index_key))
+                        # If company name wasn't found in text, use zip filename
+                        if report.company_name == "Unknown Company":
+                             report.company_name = zip_file.name.replace(".zip", "")
                     
-                    report["source_zip_index"] = idx
-                    all_reports.append(report)
-                    status.update(label=f"Completed {report['company_name']}", state="complete")
+                        report.source_zip_index = idx
+                        all_reports.append(report)
+                        status.update(label=f"Completed {report.company_name}", state="complete")
 
-                progress_bar.progress((idx + 1) / len(uploaded_files))
-            
-            # --- COMPUTE L1/L2/L3 RANKINGS ---
-            # Extract valid totals
-            valid_reports = []
-            for r in all_reports:
-                try:
-                    price = float(r.get("grand_total", 0))
-                    valid_reports.append({"price": price, "report": r})
-                except:
-                    pass
+                    progress_bar.progress((idx + 1) / len(uploaded_files))
             
-            # Sort by price ascending
-            valid_reports.sort(key=lambda x: x["price"])
-            
-            if valid_reports:
-                # Assign Dynamic Rankings (L1, L2...? Ln)
-                for i, item in enumerate(valid_reports):
-                    item["report"]["rank_label"] = f"L{i+1}"
-            
-            # Formate the commercial_info string
-            for item in valid_reports:
-                price = item["price"]
-                label = item["report"].get("rank_label", "")
-                if price > 0:
-                    item["report"]["commercial_info"] = f"{label} - {price:,.2f} OMR"
+                # --- COMPUTE L1/L2/L3 RANKINGS ---
+                with metrics.span("scoring"):
+                    # Sort by price ascending
+                    valid_reports = sorted(all_reports, key=lambda r: r.grand_total)
+                
+                    # Assign Dynamic Rankings (L1, L2...? Ln)
+                    for i, r in enumerate(valid_reports):
+                        r.rank_label = f"L{i+1}"
+                
+                    # Formate the commercial_info string
+                    for r in valid_reports:
+                        if r.grand_total > 0:
+                            r.commercial_info = f"{r.rank_label} - {r.grand_total:,.2f} OMR"
             
-            st.session_state.analysis_result = all_reports # Store LIST of reports
+                st.session_state.analysis_result = all_reports # Store LIST of reports
+                st.session_state.audit_metrics = metrics
             
-            duration = (datetime.now() - start_time).total_seconds()
-            st.success(f"Audit Complete in {duration:.2f} seconds!")
+                duration = (datetime.now() - start_time).total_seconds()
+                st.success(f"Audit Complete in {duration:.2f} seconds!")
 
+                if all_reports:
+                    try:
+                        try:
+                            store.save_tender(tender_id, all_reports, duration_s=duration, overwrite=overwrite, staged_index=index_key)
+                        except TenderExistsError:
+                            # Another session stored this ID while the audit ran: keep both results
+                            taken_id, tender_id = tender_id, new_tender_id()
+                            store.save_tender(tender_id, all_reports, duration_s=duration, staged_index=index_key)
+                            st.warning(f"Tender {taken_id} was stored by another session meanwhile; this audit was saved as {tender_id}.")
+                        st.session_state.loaded_tender_id = tender_id
+                        # The next run gets a fresh ID instead of warning about the audit just saved
+                        st.session_state.default_tender_id = new_tender_id()
+                        st.info(f"Saved to audit store as **{tender_id}**.")
+                    except Exception as e:
+                        st.warning(f"Audit could not be saved: {e}")
+            finally:
+                # No-op after a successful save; otherwise drops the staged text of a failed,
+                # interrupted (widget rerun, stopped session) or unsaved run
+                store.clear_index(index_key)
 
 
-    # --- 6. DISPLAY RESULTS (Same as before) ---
-    if "analysis_result" in st.session_state and st.session_state.analysis_result:
-        reports = st.session_state.analysis_result
-        if not isinstance(reports, list): # Handle legacy/single file case just in case
-             reports = [reports]
 
-        # Re-construct valid_reports for the conclusion logic logic below
-        valid_reports = []
-        for r in reports:
-            try:
-                # We saved price as float in grand_total if it was found
-                price = float(r.get("grand_total", 0))
-                if price > 0:
-                     valid_reports.append({"price": price, "report": r})
-            except:
-                pass
-        valid_reports.sort(key=lambda x: x["price"])
-
-        # --- COMBINED TENDER ANALYTICS ---
-        st.subheader("📊 Comparative Tender Analytics")
-        
-        tender_data = {
-            "Aspect": [
-                "Technical Compliance Score",
-                "Commercial Comparision",
-                "In Country Value(ICV)",
-                "Previous Project History",
-                "Paymenet Terms"
-            ]
-        }
+# --- 6. DISPLAY RESULTS (Same as before) ---
+if "analysis_result" in st.session_state and st.session_state.analysis_result:
+    reports = st.session_state.analysis_result
+    if st.session_state.get("loaded_tender_id"):
+        st.caption(f"Tender: {st.session_state.loaded_tender_id}")
+    if not isinstance(reports, list): # Handle legacy/single file case just in case
+         reports = [reports]
+
+    # Re-construct valid_reports for the conclusion logic logic below
+    valid_reports = sorted([r for r in reports if r.grand_total > 0], key=lambda r: r.grand_total)
+
+    # --- COMBINED TENDER ANALYTICS ---
+    st.subheader("📊 Comparative Tender Analytics")
+    
+    tender_data = {
+        "Aspect": [
+            "Technical Compliance Score",
+            "Commercial Comparision",
+            "In Country Value(ICV)",
+            "Previous Project History",
+            "Paymenet Terms"
+        ]
+    }
+    
+    for res in reports:
+         # Extracted score / history if available, else calculated from the documents
+         tender_data[res.company_name] = [
+            f"{res.tech_score:g}%",
+            res.commercial_info,
+            res.icv_text,
+            str(int(res.project_total)),
+            res.payment_terms
+        ]
         
-        for res in reports:
-             company = res.get("company_name", "Unknown")
-             
-             # Recalculate basic metrics if needed or pull from res keys if we stored them
-             no_of_missing_docs = len(res["missing_documents"])
-             
-             # Use extracted score if available, else calculate
-             extracted_score = res.get("technical_compliance_score", "N/A")
-             if extracted_score != "N/A":
-                 doc_score = extracted_score
-             else:
-                 doc_score = f"{round(((14 - no_of_missing_docs) / 14) * 100, 2)}%"
-
-             # Use extracted history if available, else count
-             extracted_history = res.get("project_history", "N/A")
-             if extracted_history != "N/A":
-                 history_display = extracted_history
-             else:
-                 total_projects = sum([item.get('project_count', 0) for item in res.get('reference_list', [])])
-                 history_display = str(total_projects)
-             
-             tender_data[company] = [
-                doc_score,
-                res.get("commercial_info", "N/A"),
-                res.get("icv_score", "N/A"),
-                history_display,
-                res.get("payment_terms", "N/A")
-            ]
-            
-        df_analytics = pd.DataFrame(tender_data)
-        df_analytics.index = df_analytics.index + 1
-        df_analytics.index.name = "Sr. No"
-        st.dataframe(df_analytics, use_container_width=True) 
-
-        # --- BAR CHART ---
-        chart_data = []
-        for res in reports:
-            comp_name = res.get("company_name", "Unknown")
-            g_total = res.get("grand_total", 0.0)
-            if g_total > 0:
-                chart_data.append({"Company": comp_name, "Bid Value (OMR)": g_total})
+    df_analytics = pd.DataFrame(tender_data)
+    df_analytics.index = df_analytics.index + 1
+    df_analytics.index.name = "Sr. No"
+    st.dataframe(df_analytics, use_container_width=True) 
+
+    # --- BAR CHART ---
+    chart_data = []
+    for res in reports:
+        if res.grand_total > 0:
+            chart_data.append({"Company": res.company_name, "Bid Value (OMR)": res.grand_total})
+    
+    if chart_data:
+        st.subheader("📉 Price Comparison Model")
+        df_chart = pd.DataFrame(chart_data)
         
-        if chart_data:
-            st.subheader("📉 Price Comparison Model")
-            df_chart = pd.DataFrame(chart_data)
-            
-            # Custom Aesthetic Bar Chart
-            base = alt.Chart(df_chart).encode(
-                x=alt.X('Company', sort='-y', axis=alt.Axis(labelAngle=-45, title="Company Name")),
-                y=alt.Y('Bid Value (OMR)', axis=alt.Axis(title="Bid Value (OMR)")),
-                tooltip=['Company', alt.Tooltip('Bid Value (OMR)', format=",.2f")]
-            )
+        # Custom Aesthetic Bar Chart
+        base = alt.Chart(df_chart).encode(
+            x=alt.X('Company', sort='-y', axis=alt.Axis(labelAngle=-45, title="Company Name")),
+            y=alt.Y('Bid Value (OMR)', axis=alt.Axis(title="Bid Value (OMR)")),
+            tooltip=['Company', alt.Tooltip('Bid Value (OMR)', format=",.2f")]
+        )
 
-            bars = base.mark_bar().encode(
-                color=alt.Color('Company', legend=None, scale=alt.Scale(scheme='tableau10'))
-            )
+        bars = base.mark_bar().encode(
+            color=alt.Color('Company', legend=None, scale=alt.Scale(scheme='tableau10'))
+        )
 
-            text = base.mark_text(align='center', baseline='bottom', dy=-5, fontWeight='bold').encode(
-                text=alt.Text('Bid Value (OMR)', format=",.0f")
-            )
+        text = base.mark_text(align='center', baseline='bottom', dy=-5, fontWeight='bold').encode(
+            text=alt.Text('Bid Value (OMR)', format=",.0f")
+        )
 
-            st.altair_chart((bars + text).interactive(), use_container_width=True)
+        st.altair_chart((bars + text).interactive(), use_container_width=True)
 
-        # --- CONCLUSION ---
-        if valid_reports:
-            st.subheader("💡 Expert Conclusion & Weighted Scoring")
+    # --- CONCLUSION ---
+    if valid_reports:
+        st.subheader("💡 Expert Conclusion & Weighted Scoring")
 
-            # Helper to parse numeric values
-            def parse_val(val_str, default=0.0):
-                if isinstance(val_str, (int, float)): return float(val_str)
-                try:
-                    # Extract first float/int found
-                    match = re.search(r"(\d+(\.\d+)?)", str(val_str))
-                    if match:
-                        return float(match.group(1))
-                except:
-                    pass
-                return default
-
-            # Prepare Data
-            aspects = ["Technical Compliance(4)", "Commercial Compliance(2)", "In Country Value(2)", "Previous Project History(1)", "Payment Terms(1)"]
-            weights = {"Tech": 4, "Comm": 2, "ICV": 2, "Hist": 1, "Pay": 1}
+        # Prepare Data
+        aspects = ["Technical Compliance(4)", "Commercial Compliance(2)", "In Country Value(2)", "Previous Project History(1)", "Payment Terms(1)"]
+        weights = {"Tech": 4, "Comm": 2, "ICV": 2, "Hist": 1, "Pay": 1}
+        
+        # We need to collect raw values for comparison
+        # Structure: {company: {tech_val, comm_val, ...}}
+        comp_data = {}
+        
+        for r in valid_reports:
+            # Numbers were parsed once in VendorReport; NaN means "not found" and scores as 0
+            icv_val = 0.0 if math.isnan(r.icv_score) else r.icv_score
+            hist_val = r.project_total
+            pay_val = r.advance_payment_percentage
             
-            # We need to collect raw values for comparison
-            # Structure: {company: {tech_val, comm_val, ...}}
-            comp_data = {}
+            comp_data[r.company_name] = {
+                "Tech": {"val": r.tech_score, "display": f"{r.tech_score:g}%"},
+                "Comm": {"val": r.grand_total, "display": r.rank_label or "N/A"},
+                "ICV": {"val": icv_val, "display": r.icv_text},
+                "Hist": {"val": hist_val, "display": str(int(hist_val))},
+                "Pay": {"val": pay_val, "display": f"{int(pay_val)}%"},
+            }
+
+        # Determine Winners
+        # Tech: Max
+        max_tech = max([d["Tech"]["val"] for d in comp_data.values()] or [0])
+        # Comm: Min
+        min_price = min([d["Comm"]["val"] for d in comp_data.values()] or [0])
+        # ICV: Max
+        max_icv = max([d["ICV"]["val"] for d in comp_data.values()] or [0])
+        # Hist: Max
+        max_hist = max([d["Hist"]["val"] for d in comp_data.values()] or [0])
+        # Pay: Min (Assuming % Advance is standard and lower is better as per user request)
+        min_pay = min([d["Pay"]["val"] for d in comp_data.values()] or [0])
+        
+        # Calculate Scores
+        row_tech = {"Aspects": "Technical Compliance(4)"}
+        row_comm = {"Aspects": "Commercial Compliance(2)"}
+        row_icv = {"Aspects": "In Country Value(2)"}
+        row_hist = {"Aspects": "Previous Project History(1)"}
+        row_pay = {"Aspects": "Payment Terms(1)"}
+        row_total = {"Aspects": "Total"}
+
+        # Calculate Scores
+        # Re-defined with separate weightage column
+        row_tech = {"Aspects": "Technical Compliance", "Weightage": "(4)"}
+        row_comm = {"Aspects": "Commercial Compliance", "Weightage": "(2)"}
+        row_icv = {"Aspects": "In Country Value", "Weightage": "(2)"}
+        row_hist = {"Aspects": "Previous Project History", "Weightage": "(1)"}
+        row_pay = {"Aspects": "Payment Terms", "Weightage": "(1)"}
+        row_total = {"Aspects": "Total", "Weightage": ""}
+
+        # Track total scores
+        scores = {c: 0 for c in comp_data}
+        winners = {c: [] for c in comp_data} # list of aspects won
+
+        for c, data in comp_data.items():
+            # Tech
+            is_win = (data["Tech"]["val"] >= max_tech and max_tech > 0)
+            if is_win: 
+                scores[c] += weights["Tech"]
+                winners[c].append("Tech")
+            row_tech[c] = data["Tech"]["display"]
+
+            # Comm
+            is_win = (data["Comm"]["val"] <= min_price and min_price > 0)
+            if is_win:
+                scores[c] += weights["Comm"]
+                winners[c].append("Comm")
+            row_comm[c] = data["Comm"]["display"]
+
+            # ICV
+            is_win = (data["ICV"]["val"] >= max_icv and max_icv > 0)
+            if is_win:
+                scores[c] += weights["ICV"]
+                winners[c].append("ICV")
+            row_icv[c] = data["ICV"]["display"]
+
+            # Hist
+            is_win = (data["Hist"]["val"] >= max_hist and max_hist > 0)
+            if is_win:
+                scores[c] += weights["Hist"]
+                winners[c].append("Hist")
+            row_hist[c] = data["Hist"]["display"]
+
+            # Pay
+            is_win = (data["Pay"]["val"] <= min_pay and min_pay > 0)
+            if is_win:
+                scores[c] += weights["Pay"]
+                winners[c].append("Pay")
+            row_pay[c] = data["Pay"]["display"]
+
+            # Total
+            row_total[c] = scores[c]
+
+        df_ex = pd.DataFrame([row_tech, row_comm, row_icv, row_hist, row_pay, row_total])
+        
+        # Reorder columns to put Weightage first
+        cols = ["Aspects", "Weightage"] + [c for c in df_ex.columns if c not in ["Aspects", "Weightage"]]
+        df_ex = df_ex[cols]
+        
+        # Use Aspects as index for cleaner display, but maybe keep it as column? 
+        # User request: "add extra column named as weightege" -> Implies table structure.
+        # Standard dataframe display in Streamlit handles columns well.
+        # Let's set index to Aspects so we don't have a numeric index.
+        df_ex.set_index("Aspects", inplace=True)
+        
+        # Styling
+        def highlight_winners(df_in):
+            # df_in is the dataframe. We return a DataFrame of CSS strings.
+            style_df = pd.DataFrame('', index=df_in.index, columns=df_in.columns)
             
-            for item in valid_reports:
-                r = item["report"]
-                c_name = r.get("company_name", "Unknown")
-                price = item["price"] # Already float
+            # Check each cell
+            for c in df_in.columns:
+                if c == "Weightage": continue
                 
-                # Tech Score
-                tech_str = r.get("technical_compliance_score", "0")
-                # Fallback to calculated if tech_str is N/A or empty
-                if tech_str in ["N/A", ""]:
-                     # Re-calculate based on missing docs as fallback
-                     miss = len(r["missing_documents"])
-                     tech_val = round(((14 - miss) / 14) * 100, 2)
-                     tech_display = f"{tech_val}%"
-                else:
-                     tech_val = parse_val(tech_str)
-                     tech_display = tech_str
-
-                # ICV
-                icv_str = r.get("icv_score", "0")
-                icv_val = parse_val(icv_str)
-
-                # History
-                hist_str = r.get("project_history", "0")
-                hist_val = parse_val(hist_str)
-
-                # Payment (Using extracted Advance %)
-                pay_val = float(r.get("advance_payment_percentage", 0))
-                
-                comp_data[c_name] = {
-                    "Tech": {"val": tech_val, "display": tech_display},
-                    "Comm": {"val": price, "display": r.get('rank_label','N/A')},
-                    "ICV": {"val": icv_val, "display": icv_str},
-                    "Hist": {"val": hist_val, "display": str(int(hist_val))},
-                    "Pay": {"val": pay_val, "display": f"{int(pay_val)}%"},
-                }
-
-            # Determine Winners
-            # Tech: Max
-            max_tech = max([d["Tech"]["val"] for d in comp_data.values()] or [0])
-            # Comm: Min
-            min_price = min([d["Comm"]["val"] for d in comp_data.values()] or [0])
-            # ICV: Max
-            max_icv = max([d["ICV"]["val"] for d in comp_data.values()] or [0])
-            # Hist: Max
-            max_hist = max([d["Hist"]["val"] for d in comp_data.values()] or [0])
-            # Pay: Min (Assuming % Advance is standard and lower is better as per user request)
-            min_pay = min([d["Pay"]["val"] for d in comp_data.values()] or [0])
-            
-            # Calculate Scores
-            row_tech = {"Aspects": "Technical Compliance(4)"}
-            row_comm = {"Aspects": "Commercial Compliance(2)"}
-            row_icv = {"Aspects": "In Country Value(2)"}
-            row_hist = {"Aspects": "Previous Project History(1)"}
-            row_pay = {"Aspects": "Payment Terms(1)"}
-            row_total = {"Aspects": "Total"}
-
-            # Calculate Scores
-            # Re-defined with separate weightage column
-            row_tech = {"Aspects": "Technical Compliance", "Weightage": "(4)"}
-            row_comm = {"Aspects": "Commercial Compliance", "Weightage": "(2)"}
-            row_icv = {"Aspects": "In Country Value", "Weightage": "(2)"}
-            row_hist = {"Aspects": "Previous Project History", "Weightage": "(1)"}
-            row_pay = {"Aspects": "Payment Terms", "Weightage": "(1)"}
-            row_total = {"Aspects": "Total", "Weightage": ""}
-
-            # Track total scores
-            scores = {c: 0 for c in comp_data}
-            winners = {c: [] for c in comp_data} # list of aspects won
-
-            for c, data in comp_data.items():
                 # Tech
-                is_win = (data["Tech"]["val"] >= max_tech and max_tech > 0)
-                if is_win: 
-                    scores[c] += weights["Tech"]
-                    winners[c].append("Tech")
-                row_tech[c] = data["Tech"]["display"]
-
+                if "Tech" in winners.get(c, []):
+                    style_df.at["Technical Compliance", c] = 'background-color: #d4edda; color: #155724;'
                 # Comm
-                is_win = (data["Comm"]["val"] <= min_price and min_price > 0)
-                if is_win:
-                    scores[c] += weights["Comm"]
-                    winners[c].append("Comm")
-                row_comm[c] = data["Comm"]["display"]
-
+                if "Comm" in winners.get(c, []):
+                    style_df.at["Commercial Compliance", c] = 'background-color: #d4edda; color: #155724;'
                 # ICV
-                is_win = (data["ICV"]["val"] >= max_icv and max_icv > 0)
-                if is_win:
-                    scores[c] += weights["ICV"]
-                    winners[c].append("ICV")
-                row_icv[c] = data["ICV"]["display"]
-
+                if "ICV" in winners.get(c, []):
+                    style_df.at["In Country Value", c] = 'background-color: #d4edda; color: #155724;'
                 # Hist
-                is_win = (data["Hist"]["val"] >= max_hist and max_hist > 0)
-                if is_win:
-                    scores[c] += weights["Hist"]
-                    winners[c].append("Hist")
-                row_hist[c] = data["Hist"]["display"]
-
+                if "Hist" in winners.get(c, []):
+                    style_df.at["Previous Project History", c] = 'background-color: #d4edda; color: #155724;'
                 # Pay
-                is_win = (data["Pay"]["val"] <= min_pay and min_pay > 0)
-                if is_win:
-                    scores[c] += weights["Pay"]
-                    winners[c].append("Pay")
-                row_pay[c] = data["Pay"]["display"]
-
-                # Total
-                row_total[c] = scores[c]
+                if "Pay" in winners.get(c, []):
+                    style_df.at["Payment Terms", c] = 'background-color: #d4edda; color: #155724;'
+            
+            return style_df
 
-            df_ex = pd.DataFrame([row_tech, row_comm, row_icv, row_hist, row_pay, row_total])
+        st.dataframe(df_ex.style.apply(highlight_winners, axis=None), use_container_width=True)
+        
+        best_company = max(scores, key=scores.get)
+        best_score = scores[best_company]
+        
+        # Find lowest bidder for the text
+        lowest_bidder_name = "Unknown"
+        try:
+            # Filter for valid prices > 0
+            priced_reports = [r for r in reports if r.grand_total > 0]
+            if priced_reports:
+                lowest_report = min(priced_reports, key=lambda r: r.grand_total)
+                lowest_bidder_name = lowest_report.company_name
+        except:
+            pass
+
+        st.success(f"""
+        **Expert Recommendation:** 
+        Based on a detailed comparative analysis, **{best_company}** is recommended for award. Although **{lowest_bidder_name}** submitted the lowest-priced bid, the evaluation weightings indicate that **{best_company}** scores higher on the key deciding factors. Accordingly, **{best_company}** is recommended in line with the prescribed evaluation criteria.
+        """)
+
+    # --- DETAILED TABS ---
+    st.subheader("📑 Submission Checklist")
+    
+    # Create tabs for each company
+    tabs = st.tabs([r.company_name or f"Company {i+1}" for i, r in enumerate(reports)])
+    
+    for i, tab in enumerate(tabs):
+         with tab:
+            res = reports[i]
+            df_compliance = pd.DataFrame(COMPLIANCE_DATA, columns=["Sr. No", "Title", "Form submitted"])
             
-            # Reorder columns to put Weightage first
-            cols = ["Aspects", "Weightage"] + [c for c in df_ex.columns if c not in ["Aspects", "Weightage"]]
-            df_ex = df_ex[cols]
+            def style_compliance(val):
+                if val == "Yes":
+                    return 'background-color: #d4edda; color: #155724;' # Green
+                elif val == "No":
+                    return 'background-color: #f8d7da; color: #721c24;' # Red
+                return ''
             
-            # Use Aspects as index for cleaner display, but maybe keep it as column? 
-            # User request: "add extra column named as weightege" -> Implies table structure.
-            # Standard dataframe display in Streamlit handles columns well.
-            # Let's set index to Aspects so we don't have a numeric index.
-            df_ex.set_index("Aspects", inplace=True)
+            st.dataframe(df_compliance.style.map(style_compliance, subset=["Form submitted"]), use_container_width=True, hide_index=True)
+            # --- VIEW QUOTATION BUTTON ---
+            # st.write("---")
+            # st.subheader("📄 Quotation Viewer")
             
-            # Styling
-            def highlight_winners(df_in):
-                # df_in is the dataframe. We return a DataFrame of CSS strings.
-                style_df = pd.DataFrame('', index=df_in.index, columns=df_in.columns)
-                
-                # Check each cell
-                for c in df_in.columns:
-                    if c == "Weightage": continue
-                    
-                    # Tech
-                    if "Tech" in winners.get(c, []):
-                        style_df.at["Technical Compliance", c] = 'background-color: #d4edda; color: #155724;'
-                    # Comm
-                    if "Comm" in winners.get(c, []):
-                        style_df.at["Commercial Compliance", c] = 'background-color: #d4edda; color: #155724;'
-                    # ICV
-                    if "ICV" in winners.get(c, []):
-                        style_df.at["In Country Value", c] = 'background-color: #d4edda; color: #155724;'
-                    # Hist
-                    if "Hist" in winners.get(c, []):
-                        style_df.at["Previous Project History", c] = 'background-color: #d4edda; color: #155724;'
-                    # Pay
-                    if "Pay" in winners.get(c, []):
-                        style_df.at["Payment Terms", c] = 'background-color: #d4edda; color: #155724;'
-                
-                return style_df
-
-            st.dataframe(df_ex.style.apply(highlight_winners, axis=None), use_container_width=True)
+            # Retrieve the zip file object associated with this report
+            zip_idx = res.source_zip_index
+            current_zip = None
+            if zip_idx is not None and uploaded_files and 0 <= zip_idx < len(uploaded_files):
+                current_zip = uploaded_files[zip_idx]
             
-            best_company = max(scores, key=scores.get)
-            best_score = scores[best_company]
+            if current_zip:
+                # Get list of files in this zip
+                try:
+                    with zipfile.ZipFile(current_zip) as z:
+                        all_files = [f for f in z.namelist() if f.lower().endswith(".pdf") and not f.startswith("__MACOSX") and not f.startswith(".")]
+                        
+                        # Determine which file to show
+                        target_file = res.quotation_file
+                        
+                        # Fallback logic: 
+                        # 1. Use AI found file if it exists in zip
+                        # 2. Else use the first PDF found
+                        final_file_to_view = None
+                        
+                        if target_file in all_files:
+                            final_file_to_view = target_file
+                        elif all_files:
+                            final_file_to_view = all_files[0]
+                        
+                        if final_file_to_view:
+                            try:
+                                with z.open(final_file_to_view) as f:
+                                    file_content = f.read()
+                                    st.download_button(
+                                        label="Download Quotation",
+                                        data=file_content,
+                                        file_name=final_file_to_view,
+                                        mime="application/pdf",
+                                        key=f"dl_qt_{i}"
+                                    )
+                            except Exception as e:
+                                st.error(f"Error preparing download: {e}")
+                        else:
+                            st.warning("No PDF files found to download.")
+                                
+                except Exception as e:
+                    st.error(f"Error reading source zip: {e}")
+            elif zip_idx is None:
+                st.info("Loaded from the audit store. Upload this vendor's ZIP and re-run the audit to download the quotation.")
+            else:
+                st.warning("Source ZIP not found (file list may have changed). Please re-run analysis.")
+
+    # --- DIAGNOSTICS ---
+    metrics = st.session_state.get("audit_metrics")
+    if metrics and metrics.spans:
+        with st.expander("🩺 Audit Diagnostics (time per stage)", expanded=False):
+            st.dataframe(metrics.summary(), use_container_width=True, hide_index=True)
+            d1, d2 = st.columns(2)
+            with d1:
+                st.download_button(
+                    label="Export Spans (JSONL)",
+                    data=metrics.to_jsonl(),
+                    file_name=f"audit_{metrics.audit_id}.jsonl",
+                    mime="application/x-ndjson",
+                    key="dl_metrics_jsonl"
+                )
+            with d2:
+                st.download_button(
+                    label="Export Metrics (Prometheus)",
+                    data=metrics.to_prometheus(),
+                    file_name=f"audit_{metrics.audit_id}.prom",
+                    mime="text/plain",
+                    key="dl_metrics_prom"
+                )
             
-            # Find lowest bidder for the text
-            lowest_bidder_name = "Unknown"
-            try:
-                # Filter for valid prices > 0
-                priced_reports = [r for r in reports if float(r.get("grand_total", 0)) > 0]
-                if priced_reports:
-                    lowest_report = min(priced_reports, key=lambda r: float(r.get("grand_total", 0)))
-                    lowest_bidder_name = lowest_report.get("company_name", "Unknown")
-            except:
-                pass
-
-            st.success(f"""
-            **Expert Recommendation:** 
-            Based on a detailed comparative analysis, **{best_company}** is recommended for award. Although **{lowest_bidder_name}** submitted the lowest-priced bid, the evaluation weightings indicate that **{best_company}** scores higher on the key deciding factors. Accordingly, **{best_company}** is recommended in line with the prescribed evaluation criteria.
-            """)
-
-        # --- DETAILED TABS ---
-        st.subheader("📑 Submission Checklist")
-        
-        # Create tabs for each company
-        tabs = st.tabs([r.get("company_name", f"Company {i+1}") for i, r in enumerate(reports)])
-        
-        for i, tab in enumerate(tabs):
-             with tab:
-                res = reports[i]
-                df_compliance = pd.DataFrame(COMPLIANCE_DATA, columns=["Sr. No", "Title", "Form submitted"])
-                
-                def style_compliance(val):
-                    if val == "Yes":
-                        return 'background-color: #d4edda; color: #155724;' # Green
-                    elif val == "No":
-                        return 'background-color: #f8d7da; color: #721c24;' # Red
-                    return ''
-                
-                st.dataframe(df_compliance.style.map(style_compliance, subset=["Form submitted"]), use_container_width=True, hide_index=True)
-                # --- VIEW QUOTATION BUTTON ---
-                # st.write("---")
-                # st.subheader("📄 Quotation Viewer")
-                
-                # Retrieve the zip file object associated with this report
-                zip_idx = res.get("source_zip_index")
-                current_zip = None
-                if zip_idx is not None and 0 <= zip_idx < len(uploaded_files):
-                    current_zip = uploaded_files[zip_idx]
-                
-                if current_zip:
-                    # Get list of files in this zip
-                    try:
-                        with zipfile.ZipFile(current_zip) as z:
-                            all_files = [f for f in z.namelist() if f.lower().endswith(".pdf") and not f.startswith("__MACOSX") and not f.startswith(".")]
-                            
-                            # Determine which file to show
-                            target_file = res.get("quotation_file")
-                            
-                            # Fallback logic: 
-                            # 1. Use AI found file if it exists in zip
-                            # 2. Else use the first PDF found
-                            final_file_to_view = None
-                            
-                            if target_file in all_files:
-                                final_file_to_view = target_file
-                            elif all_files:
-                                final_file_to_view = all_files[0]
-                            
-                            if final_file_to_view:
-                                try:
-                                    with z.open(final_file_to_view) as f:
-                                        file_content = f.read()
-                                        st.download_button(
-                                            label="Download Quotation",
-                                            data=file_content,
-                                            file_name=final_file_to_view,
-                                            mime="application/pdf",
-                                            key=f"dl_qt_{i}"
-                                        )
-                                except Exception as e:
-                                    st.error(f"Error preparing download: {e}")
-                            else:
-                                st.warning("No PDF files found to download.")
-                                    
-                    except Exception as e:
-                        st.error(f"Error reading source zip: {e}")
-                else:
-                    st.warning("Source ZIP not found (file list may have changed). Please re-run analysis.")
-                
-        
+    
@@ -0,0 +1,8 @@
+import pytest
+
+from audit_store import AuditStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AuditStore(str(tmp_path / "audit_store.db"))
@@ -0,0 +1,241 @@
+"""
+Concurrent-session load test.
+
+Drives bid_app.py through Streamlit's AppTest: every simulated evaluator gets
+its own session, uploads the vendor ZIPs and clicks "Run Audit" while the
+others do the same. Gemini is replaced by the fake model from benchmark.py.
+Prints one JSON report (latency percentiles, process RSS growth, per-session
+session_state size):
+
+    python loadtest.py --sessions 8 --vendors 3 --latency 1.0 > bench_output.txt
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit.logger
+
+# AppTest runs bid_app.py with the caller's cwd; its logos are relative to the repo root
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+# Never write load-test audits into the real audit store
+os.environ["NAMA_AUDIT_DB"] = os.path.join(tempfile.mkdtemp(prefix="nama-loadtest-"), "audit_store.db")
+streamlit.logger.set_log_level("error")
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import google.generativeai as genai  # noqa: E402
+try:
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache  # noqa: E402
+except ImportError:
+    ScriptCache = None
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import benchmark  # noqa: E402
+from audit_store import AuditStore  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bid_app.py")
+
+# Every AppTest run builds its own ScriptCache and recompiles bid_app.py, while the real server
+# compiles once. Concurrent compile() calls can fail on CPython 3.11 ("AST constructor recursion
+# depth mismatch"), so compilation is serialized; the scripts themselves still run in parallel.
+# ScriptCache is private Streamlit API: if a release moves it, run without the lock.
+_compile_lock = threading.Lock()
+_get_bytecode = getattr(ScriptCache, "get_bytecode", None) if ScriptCache else None
+
+def _get_bytecode_serialized(self, script_path):
+    with _compile_lock:
+        return _get_bytecode(self, script_path)
+
+if _get_bytecode is not None:
+    ScriptCache.get_bytecode = _get_bytecode_serialized
+
+
+# --- 1. MEASUREMENT HELPERS ---
+def current_rss_mb():
+    """Resident set size of this process (the simulated server) in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class RssSampler(threading.Thread):
+    def __init__(self, interval=0.2):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.samples.append(current_rss_mb())
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.samples.append(current_rss_mb())
+
+def deep_sizeof(obj, seen=None):
+    """Approximate retained size of obj, following containers and instance attributes."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, s), seen) for s in obj.__slots__ if hasattr(obj, s))
+    return size
+
+
+# --- 2. ONE EVALUATOR SESSION ---
+def run_session(session_idx, uploads, args, start_at):
+    delay = start_at - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+    result = {"session": session_idx, "ok": False}
+    t0 = time.perf_counter()
+    try:
+        at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+        at.run()
+        at.file_uploader[0].set_value(uploads).run()
+        t_click = time.perf_counter()
+        next(b for b in at.button if b.label == "Run Audit").click().run()
+        t_done = time.perf_counter()
+
+        errors = [str(e.value) for e in at.exception]
+        completed = any(s.value.startswith("Audit Complete") for s in at.success)
+        if not completed and not errors:
+            errors = ["audit did not complete (no 'Audit Complete' message rendered)"]
+        state_sizes = {key: deep_sizeof(at.session_state[key]) for key in at.session_state}
+        result.update({
+            "ok": completed and not errors,
+            "errors": errors,
+            "end_to_end_s": round(t_done - t0, 4),
+            "audit_s": round(t_done - t_click, 4),
+            "session_state_bytes": sum(state_sizes.values()),
+            "session_state_keys": state_sizes,
+        })
+    except Exception as e:
+        result.update({"errors": [repr(e)], "end_to_end_s": round(time.perf_counter() - t0, 4)})
+    return result
+
+
+# --- 3. RUNNER ---
+def run_load_test(args):
+    corpus_args = benchmark.parse_args([
+        "--files-per-vendor", str(args.files_per_vendor),
+        "--proposal-pages", str(args.proposal_pages),
+        "--scanned-ratio", str(args.scanned_ratio),
+        "--seed", str(args.seed),
+    ])
+    zips = [benchmark.make_vendor_zip(i, corpus_args) for i in range(args.vendors)]
+    uploads = [(z.name, z.getvalue(), "application/zip") for z in zips]
+
+    benchmark.FakeGenerativeModel.configure(args.latency, args.jitter, args.error_rate, args.seed)
+    genai.GenerativeModel = benchmark.FakeGenerativeModel
+
+    rss_start = current_rss_mb()
+    sampler = RssSampler()
+    sampler.start()
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        futures = [
+            executor.submit(run_session, i, uploads, args, wall_start + i * args.ramp_up)
+            for i in range(args.sessions)
+        ]
+        sessions = [f.result() for f in futures]
+    wall_s = time.perf_counter() - wall_start
+    sampler.stop()
+
+    # Every session has its own default Tender ID, so no audit may replace another one
+    stored = len(AuditStore(os.environ["NAMA_AUDIT_DB"]).list_tenders(limit=len(sessions) + 1))
+    ok = [s for s in sessions if s["ok"]]
+    if stored < len(ok):
+        for s in ok:
+            s["ok"] = False
+            s["errors"].append(f"only {stored} tenders stored for {len(ok)} completed audits")
+        ok = []
+    e2e = [s["end_to_end_s"] for s in ok]
+    audit = [s["audit_s"] for s in ok]
+    state_bytes = [s["session_state_bytes"] for s in ok]
+    stats = benchmark.FakeGenerativeModel.stats
+
+    def pcts(values):
+        return {
+            "p50": round(benchmark.percentile(values, 50), 4),
+            "p95": round(benchmark.percentile(values, 95), 4),
+            "max": round(max(values), 4) if values else 0.0,
+        }
+
+    return {
+        "revision": benchmark.git_revision(),
+        "config": vars(args),
+        "wall_s": round(wall_s, 4),
+        "sessions": {"total": len(sessions), "ok": len(ok), "failed": len(sessions) - len(ok), "stored_tenders": stored},
+        "end_to_end_s": pcts(e2e),
+        "audit_s": pcts(audit),
+        "rss_mb": {
+            "start": round(rss_start, 1),
+            "peak": round(max(sampler.samples), 1),
+            "end": round(sampler.samples[-1], 1),
+            "growth": round(sampler.samples[-1] - rss_start, 1),
+        },
+        "session_state_bytes": {
+            "mean": int(sum(state_bytes) / len(state_bytes)) if state_bytes else 0,
+            "max": max(state_bytes) if state_bytes else 0,
+        },
+        "model": {
+            "calls": stats.calls,
+            "errors": stats.errors,
+            "input_tokens": stats.input_tokens,
+            "output_tokens": stats.output_tokens,
+        },
+        "per_session": sessions,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the NAMA Streamlit app.")
+    parser.add_argument("--sessions", type=int, default=4, help="simulated evaluators running an audit at once")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds between session starts")
+    parser.add_argument("--vendors", type=int, default=3, help="vendor ZIPs uploaded by every session")
+    parser.add_argument("--files-per-vendor", type=int, default=14)
+    parser.add_argument("--proposal-pages", type=int, default=10)
+    parser.add_argument("--scanned-ratio", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=600, help="per-run AppTest timeout in seconds")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_load_test(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if report["sessions"]["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Typed per-vendor audit report.
+
+analyze_documents merges the Gemini batch answers into a VendorReport once.
+Numbers ("12%", "5 projects", "N/A") are parsed here a single time, and the
+per-document findings are kept as columnar numpy arrays. Document categories
+are stored as small int codes into REQUIRED_DOCS and ISO expiry dates as
+datetime64. The UI reads floats and arrays directly instead of re-parsing
+strings on every rerun.
+"""
+import math
+import re
+import sys
+from dataclasses import dataclass, field
+
+import numpy as np
+
+REQUIRED_DOCS = [
+    "1- Fees application receipt copy.",
+    "2- Nama water services vendor registeration certificates & Product Agency certificates or authorization letter from Factory for local distributor ratified from Oman embassy.",
+    "3- Certificate of incorporation of the firm (Factory & Foundry).",
+    "4- Manufacturing Process flow chart of product and list of out sourced process / operation if applicable including Outsourcing name & address.",
+    "5- Valid copies certificates of (ISO 9001, ISO 45001 & ISO 14001).",
+    "6- Factory Layout chart.",
+    "7- Factory Organizational structure, Hierarchy levels, Ownership details.",
+    "8- Product Compliance Statement with reference to Nama water services specifications (with supports documents accordingly).",
+    "9- Product Technical datasheets.",
+    "10- Omanisation details from Ministry of Labour.",
+    "11- Product Independent Test certificates.",
+    "12- Attestation of Sanitary Conformity (hygiene test including mechanical assessment for a full product certificate at 50 degrees Celsiusfull to used in drinking water)",
+    "13- Provide products Chemicals Composition of materials.",
+    "14- Reference list of products used in Oman or any GCC projects with contact no. or emails of end user or clients."
+]
+
+UNKNOWN_CATEGORY = -1
+_CATEGORY_CODES = {name: code for code, name in enumerate(REQUIRED_DOCS)}
+# Optional sign (not a hyphen as in "ISO-9001"), thousands separators, decimals
+_INT32_MIN, _INT32_MAX = int(np.iinfo(np.int32).min), int(np.iinfo(np.int32).max)
+_NUMBER_RE = re.compile(r"(?:(?<![\w.])-)?\d[\d,]*(?:\.\d+)?")
+
+
+def parse_val(val_str, default=0.0):
+    """First number in a model answer ("98%", "-30 days", "OMR 1,250,000.50") as float, else default."""
+    if isinstance(val_str, bool):
+        return default
+    if isinstance(val_str, (int, float)):
+        return float(val_str)
+    match = _NUMBER_RE.search(str(val_str or ""))
+    if match:
+        return float(match.group(0).replace(",", ""))
+    return default
+
+def parse_int(value, default=0):
+    """
+    Like parse_val for counts and day spans; integers from the model are taken as they are.
+    Values outside int32 (the dtype of the report arrays) fall back to default.
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        number = value
+    else:
+        number = parse_val(value, math.nan)
+        if math.isnan(number) or math.isinf(number):
+            return default
+        number = int(number)
+    return number if _INT32_MIN <= number <= _INT32_MAX else default
+
+def category_code(name):
+    """Index of a category in REQUIRED_DOCS. Falls back to its leading "N-" number, else UNKNOWN_CATEGORY."""
+    code = _CATEGORY_CODES.get(name)
+    if code is not None:
+        return code
+    match = re.match(r"\s*(\d+)\s*-", str(name or ""))
+    if match and 1 <= int(match.group(1)) <= len(REQUIRED_DOCS):
+        return int(match.group(1)) - 1
+    return UNKNOWN_CATEGORY
+
+def _text(value, default="N/A"):
+    if value is None or value == "":
+        return default
+    return sys.intern(str(value))
+
+def _float_or_none(value):
+    return None if value is None or math.isnan(value) else value
+
+
+@dataclass(slots=True)
+class DocumentTable:
+    """Classified documents of one vendor, one array entry per file."""
+    filename: tuple = ()
+    category: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int8))
+    status: tuple = ()
+    project_count: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = [r for r in rows if isinstance(r, dict)]
+        return cls(
+            filename=tuple(_text(r.get("filename"), "") for r in rows),
+            category=np.fromiter((category_code(r.get("Category")) for r in rows), dtype=np.int8, count=len(rows)),
+            status=tuple(_text(r.get("Status"), "") for r in rows),
+            project_count=np.fromiter((parse_int(r.get("project_count")) for r in rows), dtype=np.int32, count=len(rows)),
+        )
+
+    def __len__(self):
+        return len(self.filename)
+
+    def category_names(self):
+        return [REQUIRED_DOCS[c] if c != UNKNOWN_CATEGORY else "Unclassified" for c in self.category]
+
+    def to_dict(self):
+        return {
+            "filename": list(self.filename),
+            "category": self.category.tolist(),
+            "status": list(self.status),
+            "project_count": self.project_count.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            filename=tuple(d.get("filename", [])),
+            category=np.asarray(d.get("category", []), dtype=np.int8),
+            status=tuple(sys.intern(s) for s in d.get("status", [])),
+            project_count=np.asarray(d.get("project_count", []), dtype=np.int32),
+        )
+
+
+@dataclass(slots=True)
+class IsoTable:
+    """ISO certificate checks of one vendor."""
+    standard: tuple = ()
+    expiry_date: np.ndarray = field(default_factory=lambda: np.empty(0, dtype="datetime64[D]"))
+    days_remaining: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    passed: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=bool))
+
+    @staticmethod
+    def _date(value):
+        try:
+            return np.datetime64(str(value)[:10], "D")
+        except ValueError:
+            return np.datetime64("NaT", "D")
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows = [r for r in rows if isinstance(r, dict)]
+        return cls(
+            standard=tuple(_text(r.get("standard"), "") for r in rows),
+            expiry_date=np.array([cls._date(r.get("expiry_date")) for r in rows], dtype="datetime64[D]"),
+            days_remaining=np.fromiter((parse_int(r.get("days_remaining")) for r in rows), dtype=np.int32, count=len(rows)),
+            passed=np.fromiter((str(r.get("compliance_status", "")).lower() == "pass" for r in rows), dtype=bool, count=len(rows)),
+        )
+
+    def __len__(self):
+        return len(self.standard)
+
+    def to_dict(self):
+        return {
+            "standard": list(self.standard),
+            "expiry_date": [None if np.isnat(d) else str(d) for d in self.expiry_date],
+            "days_remaining": self.days_remaining.tolist(),
+            "passed": self.passed.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            standard=tuple(d.get("standard", [])),
+            expiry_date=np.array([cls._date(v) for v in d.get("expiry_date", [])], dtype="datetime64[D]"),
+            days_remaining=np.asarray(d.get("days_remaining", []), dtype=np.int32),
+            passed=np.asarray(d.get("passed", []), dtype=bool),
+        )
+
+
+@dataclass(slots=True)
+class VendorReport:
+    """
+    Aggregated audit result for one vendor ZIP.
+    Numeric fields are floats (NaN = not found in the documents); the *_text fields keep
+    the model's wording for display.
+    """
+    company_name: str = "Unknown Company"
+    grand_total: float = 0.0
+    icv_score: float = math.nan
+    icv_text: str = "N/A"
+    technical_compliance_score: float = math.nan
+    project_history: float = math.nan
+    advance_payment_percentage: float = 0.0
+    payment_terms: str = "N/A"
+    commercial_info: str = "N/A"
+    quotation_file: str = None
+    wras_found: bool = False
+    wras_id: str = ""
+    documents: DocumentTable = field(default_factory=DocumentTable)
+    references: DocumentTable = field(default_factory=DocumentTable)
+    iso: IsoTable = field(default_factory=IsoTable)
+    rank_label: str = None
+    source_zip_index: int = None
+
+    # --- Derived values used by the scoring tables ---
+    @property
+    def missing_mask(self):
+        """Boolean per REQUIRED_DOCS entry: True when no submitted file was classified into it."""
+        mask = np.ones(len(REQUIRED_DOCS), dtype=bool)
+        mask[self.documents.category[self.documents.category != UNKNOWN_CATEGORY]] = False
+        return mask
+
+    @property
+    def missing_documents(self):
+        return [REQUIRED_DOCS[i] for i in np.flatnonzero(self.missing_mask)]
+
+    @property
+    def tech_score(self):
+        """Extracted technical compliance score, else the share of REQUIRED_DOCS that were submitted."""
+        if not math.isnan(self.technical_compliance_score):
+            return self.technical_compliance_score
+        total = len(REQUIRED_DOCS)
+        return round(((total - int(self.missing_mask.sum())) / total) * 100, 2)
+
+    @property
+    def project_total(self):
+        """Extracted project count, else the sum of projects listed in the reference documents."""
+        if not math.isnan(self.project_history):
+            return self.project_history
+        return float(self.references.project_count.sum())
+
+    # --- Construction / serialization ---
+    @classmethod
+    def from_legacy(cls, d):
+        """Builds a report from the merged dict analyze_documents collects (also the pre-typed store format)."""
+        wras = d.get("wras_analysis") or {}
+        wras_id = wras.get("wras_id", "")
+        if isinstance(wras_id, list):
+            wras_id = ", ".join(str(w) for w in wras_id)
+        tech = d.get("technical_compliance_score", "N/A")
+        hist = d.get("project_history", "N/A")
+        icv = d.get("icv_score", "N/A")
+        return cls(
+            company_name=_text(d.get("company_name"), "Unknown Company"),
+            grand_total=parse_val(d.get("grand_total")),
+            icv_score=parse_val(icv, math.nan),
+            icv_text=_text(icv),
+            technical_compliance_score=math.nan if tech in ("N/A", "", None) else parse_val(tech, math.nan),
+            project_history=math.nan if hist in ("N/A", "", None) else parse_val(hist, math.nan),
+            advance_payment_percentage=parse_val(d.get("advance_payment_percentage")),
+            payment_terms=_text(d.get("payment_terms")),
+            commercial_info=_text(d.get("commercial_info")),
+            quotation_file=d.get("quotation_file") or None,
+            wras_found=bool(wras.get("found")),
+            wras_id=str(wras_id or ""),
+            documents=DocumentTable.from_rows(d.get("found_documents", [])),
+            references=DocumentTable.from_rows(d.get("reference_list", [])),
+            iso=IsoTable.from_rows(d.get("iso_analysis", [])),
+            rank_label=d.get("rank_label"),
+            source_zip_index=d.get("source_zip_index"),
+        )
+
+    def to_dict(self):
+        return {
+            "company_name": self.company_name,
+            "grand_total": self.grand_total,
+            "icv_score": _float_or_none(self.icv_score),
+            "icv_text": self.icv_text,
+            "technical_compliance_score": _float_or_none(self.technical_compliance_score),
+            "project_history": _float_or_none(self.project_history),
+            "advance_payment_percentage": self.advance_payment_percentage,
+            "payment_terms": self.payment_terms,
+            "commercial_info": self.commercial_info,
+            "quotation_file": self.quotation_file,
+            "wras_found": self.wras_found,
+            "wras_id": self.wras_id,
+            "documents": self.documents.to_dict(),
+            "references": self.references.to_dict(),
+            "iso": self.iso.to_dict(),
+            "rank_label": self.rank_label,
+            "source_zip_index": self.source_zip_index,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        if "documents" not in d:
+            return cls.from_legacy(d)
+
+        def num(key, default=math.nan):
+            value = d.get(key)
+            return default if value is None else float(value)
+
+        return cls(
+            company_name=d.get("company_name", "Unknown Company"),
+            grand_total=num("grand_total", 0.0),
+            icv_score=num("icv_score"),
+            icv_text=d.get("icv_text", "N/A"),
+            technical_compliance_score=num("technical_compliance_score"),
+            project_history=num("project_history"),
+            advance_payment_percentage=num("advance_payment_percentage", 0.0),
+            payment_terms=d.get("payment_terms", "N/A"),
+            commercial_info=d.get("commercial_info", "N/A"),
+            quotation_file=d.get("quotation_file"),
+            wras_found=bool(d.get("wras_found")),
+            wras_id=d.get("wras_id", ""),
+            documents=DocumentTable.from_dict(d.get("documents", {})),
+            references=DocumentTable.from_dict(d.get("references", {})),
+            iso=IsoTable.from_dict(d.get("iso", {})),
+            rank_label=d.get("rank_label"),
+            source_zip_index=d.get("source_zip_index"),
+        )
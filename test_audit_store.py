@@ -0,0 +1,75 @@
+"""
+Tests for saving, loading and listing tenders in the audit store.
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+import re
+from datetime import date
+
+import pytest
+
+from audit_store import TenderExistsError, new_tender_id
+from report_model import REQUIRED_DOCS, VendorReport
+
+
+def save(store, tender_id, *vendors, created_at=None):
+    store.save_tender(tender_id, [VendorReport(company_name=v, grand_total=100.0) for v in vendors])
+    if created_at:
+        with store._connect() as conn:
+            conn.execute("UPDATE tenders SET created_at = ? WHERE tender_id = ?", (created_at, tender_id))
+
+
+# --- Saving / loading ---
+def test_save_and_load_round_trip(store):
+    reports = [
+        VendorReport.from_legacy({
+            "company_name": "Acme Pipes",
+            "grand_total": "OMR 1,250,000.50",
+            "found_documents": [{"filename": "fees.pdf", "Category": REQUIRED_DOCS[0], "Status": "Valid"}],
+            "iso_analysis": [
+                {"standard": "ISO 9001", "expiry_date": "2027-01-31", "days_remaining": 470},
+                {"standard": "ISO 14001", "expiry_date": "unknown", "days_remaining": "-30"},
+            ],
+        }),
+        VendorReport(company_name="Second Vendor"),
+    ]
+    store.save_tender("T-1", reports, duration_s=1.5)
+
+    loaded = store.load_tender("T-1")
+    assert [r.to_dict() for r in loaded] == [r.to_dict() for r in reports]
+    assert loaded[0].iso.days_remaining.tolist() == [470, -30]
+    assert store.load_tender("T-unknown") == []
+
+def test_save_refuses_existing_tender_unless_overwrite(store):
+    store.save_tender("T-1", [VendorReport(company_name="First")])
+    with pytest.raises(TenderExistsError):
+        store.save_tender("T-1", [VendorReport(company_name="Second")])
+    assert [r.company_name for r in store.load_tender("T-1")] == ["First"]
+
+    store.save_tender("T-1", [VendorReport(company_name="Second")], overwrite=True)
+    assert [r.company_name for r in store.load_tender("T-1")] == ["Second"]
+
+def test_default_tender_id_format():
+    # Date and time to the second plus a random suffix, so same-day audits get distinct IDs
+    assert re.fullmatch(r"TENDER-\d{8}-\d{6}-[0-9a-f]{4}", new_tender_id())
+
+
+# --- Listing ---
+def test_list_tenders_filters(store):
+    save(store, "ALPHA-1", "Acme Pipes", created_at="2026-01-10T09:00:00")
+    save(store, "ALPHA-2", "Blue Valves", created_at="2026-01-31T17:30:00")
+    save(store, "BETA-1", "acme pipes", "Delta Meters", created_at="2026-02-01T08:00:00")
+
+    def ids(**filters):
+        return [t["tender_id"] for t in store.list_tenders(**filters)]
+
+    assert ids() == ["BETA-1", "ALPHA-2", "ALPHA-1"]
+    assert ids(tender="alpha") == ["ALPHA-2", "ALPHA-1"]
+    assert ids(vendor="ACME") == ["BETA-1", "ALPHA-1"]
+    assert ids(since=date(2026, 1, 31)) == ["BETA-1", "ALPHA-2"]
+    # until is inclusive: a tender saved late on that day still matches
+    assert ids(until=date(2026, 1, 31)) == ["ALPHA-2", "ALPHA-1"]
+    assert ids(since=date(2026, 1, 31), until=date(2026, 1, 31)) == ["ALPHA-2"]
+    assert ids(vendor="acme", since="2026-01-11") == ["BETA-1"]
+
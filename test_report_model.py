@@ -0,0 +1,86 @@
+"""
+Tests for VendorReport parsing and serialization.
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+import json
+import math
+import zlib
+
+import pytest
+
+from audit_store import _decode_report
+from report_model import REQUIRED_DOCS, VendorReport, parse_int, parse_val
+
+LEGACY_REPORT = {
+    "company_name": "Legacy Pipes LLC",
+    "grand_total": "OMR 1,250,000.50",
+    "icv_score": "42%",
+    "technical_compliance_score": "N/A",
+    "project_history": "7 projects",
+    "advance_payment_percentage": "10%",
+    "payment_terms": "30 days",
+    "commercial_info": "Ex-works",
+    "quotation_file": "quote.pdf",
+    "wras_analysis": {"found": True, "wras_id": ["W-1", "W-2"]},
+    "found_documents": [
+        {"filename": "fees.pdf", "Category": REQUIRED_DOCS[0], "Status": "Valid"},
+        {"filename": "iso.pdf", "Category": "5- ISO certificates", "Status": "Valid"},
+    ],
+    "reference_list": [{"filename": "refs.pdf", "project_count": "12 projects"}],
+    "iso_analysis": [
+        {"standard": "ISO 9001", "expiry_date": "2027-01-31", "days_remaining": 470, "compliance_status": "Pass"},
+        {"standard": "ISO 14001", "expiry_date": "unknown", "days_remaining": "-30", "compliance_status": "Fail"},
+    ],
+    "rank_label": "L1",
+}
+
+
+def test_decodes_reports_stored_as_plain_dicts():
+    report = _decode_report(zlib.compress(json.dumps(LEGACY_REPORT).encode("utf-8")))
+
+    assert report.company_name == "Legacy Pipes LLC"
+    assert report.grand_total == 1250000.5
+    assert report.icv_score == 42.0
+    assert math.isnan(report.technical_compliance_score)
+    assert report.wras_id == "W-1, W-2"
+    assert report.documents.category.tolist() == [0, 4]
+    assert report.project_total == 7.0
+    assert str(report.iso.expiry_date[0]) == "2027-01-31"
+    assert report.iso.days_remaining.tolist() == [470, -30]
+
+def test_nan_fields_are_stored_as_none():
+    report = VendorReport(company_name="No Scores")
+    d = report.to_dict()
+    assert d["icv_score"] is None
+    assert d["technical_compliance_score"] is None
+    assert d["project_history"] is None
+    json.dumps(d, allow_nan=False)
+
+    restored = VendorReport.from_dict(d)
+    assert math.isnan(restored.icv_score)
+    assert math.isnan(restored.technical_compliance_score)
+    assert math.isnan(restored.project_history)
+
+@pytest.mark.parametrize("text, expected, expected_int", [
+    ("-30", -30.0, -30),
+    ("1,250,000.50", 1250000.5, 1250000),
+    ("98%", 98.0, 98),
+    ("ISO-9001", 9001.0, 9001),
+    ("N/A", 0.0, 0),
+    # Outside int32: the report arrays could not hold it
+    ("99999999999", 99999999999.0, 0),
+    (99999999999, 99999999999.0, 0),
+])
+def test_parse_val(text, expected, expected_int):
+    assert parse_val(text) == expected
+    assert parse_int(text) == expected_int
+
+def test_out_of_range_counts_do_not_abort_the_report():
+    report = VendorReport.from_legacy({
+        "reference_list": [{"filename": "refs.pdf", "project_count": 99999999999}],
+        "iso_analysis": [{"standard": "ISO 9001", "days_remaining": "-99999999999"}],
+    })
+    assert report.references.project_count.tolist() == [0]
+    assert report.iso.days_remaining.tolist() == [0]
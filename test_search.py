@@ -0,0 +1,66 @@
+"""
+Tests for the full-text search over extracted documents.
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+import pytest
+
+from audit_store import HIGHLIGHT_END, HIGHLIGHT_START, AuditStore, new_staging_key
+from report_model import VendorReport
+
+
+@pytest.fixture(autouse=True)
+def require_fts5(store):
+    if not store.search_enabled:
+        pytest.skip("SQLite build without FTS5")
+
+def save(store, tender_id, vendor, docs):
+    key = new_staging_key()
+    store.index_documents(key, vendor, docs)
+    store.save_tender(tender_id, [VendorReport(company_name=vendor)], staged_index=key)
+
+
+def test_search_only_returns_saved_tenders(store):
+    save(store, "T-1", "Acme Pipes", [("a.pdf", "Acme Pipes supplies ductile iron pipe")])
+    store.index_documents(new_staging_key(), "Unsaved Vendor", [("draft.pdf", "ductile iron pipe")])
+
+    hits = store.search("ductile")
+    assert [(h["tender_id"], h["vendor"]) for h in hits] == [("T-1", "Acme Pipes")]
+    assert hits[0]["snippet"].count(HIGHLIGHT_START) == hits[0]["snippet"].count(HIGHLIGHT_END) == 1
+    assert store.search("ductile", tender_id="T-2") == []
+
+def test_saving_replaces_the_tender_index(store):
+    save(store, "T-1", "Acme Pipes", [("a.pdf", "old gate valve")])
+    key = new_staging_key()
+    store.index_documents(key, "Acme Pipes", [("b.pdf", "new ductile pipe")])
+    # The stored tender keeps its text until the new audit is saved
+    assert [h["filename"] for h in store.search("valve")] == ["a.pdf"]
+    assert store.search("ductile") == []
+
+    store.save_tender("T-1", [VendorReport(company_name="Acme Pipes")], overwrite=True, staged_index=key)
+    assert store.search("valve") == []
+    assert [h["filename"] for h in store.search("ductile")] == ["b.pdf"]
+
+@pytest.mark.parametrize("text", ["!!!", "...", "-", '"', '""', '" "', "   "])
+def test_search_punctuation_and_quote_only_queries(store, text):
+    save(store, "T-1", "Acme Pipes", [("a.pdf", 'price "OMR" ... !!! - end')])
+    assert store.search(text) == []
+
+def test_search_keeps_punctuation_inside_terms(store):
+    save(store, "T-1", "Acme Pipes", [("a.pdf", "certified to ISO-9001 since 2019")])
+    assert len(store.search("ISO-9001")) == 1
+    assert len(store.search('"ISO')) == 1
+
+def test_stale_staged_text_is_purged(store):
+    running, abandoned = new_staging_key(), new_staging_key()
+    store.index_documents(running, "Acme Pipes", [("a.pdf", "ductile iron pipe")])
+    store.index_documents(abandoned, "Blue Valves", [("b.pdf", "gate valve")])
+    with store._connect() as conn:
+        conn.execute("UPDATE indexed_files SET indexed_at = '2000-01-01T00:00:00' WHERE tender_id = ?", (abandoned,))
+
+    reopened = AuditStore(store.path)
+    with reopened._connect() as conn:
+        keys = {row["tender_id"] for row in conn.execute("SELECT tender_id FROM indexed_files")}
+        assert conn.execute("SELECT count(*) FROM document_text").fetchone()[0] == 1
+    assert keys == {running}